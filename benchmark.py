@@ -0,0 +1,222 @@
+'''
+Benchmarks for the frontier computation and the brute-force G_{T=2} sweep, so that we notice when a
+change makes things slower (or, worse, different).
+
+Usage:
+
+python benchmark.py [--grid 24x2,36x2,...] [--den-limits 10,20,30] [--method search|minmax]
+                    [--r2-search linear|bisect] [--workers processes] [--repeat n]
+                    [--results file] [--baseline file] [--save-baseline] [--tolerance fraction]
+
+Every benchmark runs in a fresh process, which reports its wall time, its peak memory (max resident
+set size, and that of the largest worker with --workers) and its rate: cells of H[1..T] per second
+for frontier runs, points tested per second for brute-force runs. With --repeat, the fastest of the
+runs is kept. All results go to --results as JSON (default benchmark_results.json).
+
+Each frontier run also checks its tables against known_points/points_<t>_<gran> where those exist,
+and every run records a fingerprint of its output (a checksum of the tables, or the point counts of
+the sweep). Results are then compared against --baseline (default benchmark_baseline.json): a
+benchmark fails if its check fails or its fingerprint changed, and is reported as slower if its wall
+time grew by more than --tolerance (default 0.25). The exit status is 1 if anything failed. Use
+--save-baseline to store the current results as the new baseline.
+'''
+
+import argparse
+import frontier_functions as ff
+import hashlib
+import json
+import multiprocessing
+import numpy as np
+import os
+import platform
+import Queue
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+'''
+A checksum of the tables that does not depend on their dtype or the sentinel used for unrealizable
+cells, so that a change of storage alone does not count as a different result.
+'''
+def tables_fingerprint(tables):
+    sha1 = hashlib.sha1()
+    for H in tables:
+        sha1.update(np.where(ff.is_realizable(H), H, -1).astype("<i8").tobytes())
+    return sha1.hexdigest()
+
+'''
+Computes H[1..T] at granularity gran from scratch (no cache, no known_points/), in a temporary
+directory, and returns the timing and checks. Runs inside a worker process (see run_isolated).
+'''
+def bench_frontier(gran, T, method="search", r2_search="linear", workers=1):
+    out_dir = tempfile.mkdtemp(prefix="frontier_bench_")
+    try:
+        start = time.time()
+        tables = ff.compute_frontier(gran, T, method=method, r2_search=r2_search, out_dir=out_dir,
+                                     workers=workers, cache_dir=None, known_dirs=())
+        wall = time.time() - start
+        cells = sum((gran*t+1)**2 for t in range(1,T+1))
+        checks = {}
+        for t in range(1,T+1):
+            known = os.path.join("known_points", "points_" + str(t) + "_" + str(gran))
+            if os.path.exists(known):
+                checks[known] = ff.compare_tables(tables[t-1], ff.load_points(known))
+        return {"wall": wall, "rate": cells / wall, "rate_unit": "cells/s",
+                "fingerprint": tables_fingerprint(tables), "checks": checks}
+    finally:
+        shutil.rmtree(out_dir)
+
+'''
+Runs the brute-force G_{T=2} sweep of pareto.py with the given denominator limit, collecting the
+optimal points in a PointSet as pareto.brute_force_t2() does (without writing them out).
+'''
+def bench_brute_force_t2(den_limit, workers=1):
+    import pareto
+    import pareto_functions as par
+    optimal = par.PointSet()
+    start = time.time()
+    for (done, total, tested, points) in pareto.stream_brute_force_t2(den_limit, workers):
+        optimal.add_batch(points)
+    wall = time.time() - start
+    canonical = optimal.canonical()
+    canonical = canonical[np.lexsort(canonical.T[::-1])]
+    return {"wall": wall, "rate": tested / wall, "rate_unit": "points/s",
+            "fingerprint": "tested={} optimal={} sha1={}".format(tested, len(optimal),
+                hashlib.sha1(canonical.astype("<f8").tobytes()).hexdigest()),
+            "checks": {}}
+
+'''
+Runs one benchmark in a process of its own, with its output thrown away, and adds to its results the
+peak resident memory (in MB) of that process ("peak_mb") and of the largest of the worker processes
+it started, if any ("worker_peak_mb"). The process is not a daemon (as the processes of a Pool are),
+so that benchmarks with workers > 1 can start their own pool.
+'''
+def _run_benchmark(function, args, queue):
+    sys.stdout = open(os.devnull, "w")
+    try:
+        result = globals()[function](*args)
+    except Exception:
+        queue.put({"error": traceback.format_exc()})
+        return
+    result["peak_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    result["worker_peak_mb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024.0
+    queue.put(result)
+
+def run_isolated(function, args):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_benchmark, args=(function, args, queue))
+    process.start()
+    try:
+        while True:
+            try:
+                result = queue.get(timeout=1)
+                break
+            except Queue.Empty:
+                if not process.is_alive() and queue.empty():
+                    raise RuntimeError("{}{} died with exit code {}.".format(function, args,
+                                       process.exitcode))
+    finally:
+        process.join()
+    if "error" in result:
+        raise RuntimeError("{}{} failed:\n{}".format(function, args, result["error"]))
+    return result
+
+'''
+The list of benchmarks as (name, function, args) for the given options.
+'''
+def benchmark_list(grid, den_limits, method, r2_search, workers):
+    benchmarks = []
+    for (gran, T) in grid:
+        name = "frontier gran={} T={} {} {} workers={}".format(gran, T, method, r2_search, workers)
+        benchmarks.append((name, "bench_frontier", (gran, T, method, r2_search, workers)))
+    for den_limit in den_limits:
+        name = "brute_force_t2 den_limit={} workers={}".format(den_limit, workers)
+        benchmarks.append((name, "bench_brute_force_t2", (den_limit, workers)))
+    return benchmarks
+
+'''
+Compares results against a baseline (both dicts from benchmark names to results). Returns a list of
+(name, status, message) with status "ok", "slower", "failed" or "new".
+'''
+def compare_to_baseline(results, baseline, tolerance):
+    report = []
+    for (name, result) in sorted(results.items()):
+        bad_checks = [known for (known, diff) in sorted(result["checks"].items()) if diff != 0]
+        if bad_checks:
+            report.append((name, "failed", "differs from " + ", ".join(bad_checks)))
+            continue
+        if name not in baseline:
+            report.append((name, "new", "{:.3f}s".format(result["wall"])))
+            continue
+        old = baseline[name]
+        if old["fingerprint"] != result["fingerprint"]:
+            report.append((name, "failed", "output changed since the baseline"))
+            continue
+        ratio = result["wall"] / old["wall"]
+        status = "slower" if ratio > 1 + tolerance else "ok"
+        report.append((name, status, "{:.3f}s vs {:.3f}s ({:+.0f} %)".format(result["wall"],
+                       old["wall"], 100*(ratio-1))))
+    return report
+
+
+########
+# MAIN #
+########
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the frontier and brute-force code.")
+    parser.add_argument("--grid", default="24x2,36x2,24x3,48x2",
+                        help="comma-separated granxT frontier runs (default 24x2,36x2,24x3,48x2)")
+    parser.add_argument("--den-limits", default="10,20,30",
+                        help="comma-separated brute-force denominator limits (default 10,20,30)")
+    parser.add_argument("--method", choices=["search", "minmax"], default="search")
+    parser.add_argument("--r2-search", choices=["linear", "bisect"], default="linear")
+    parser.add_argument("--workers", type=int, default=1, help="processes per benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="keep the fastest of this many runs")
+    parser.add_argument("--results", default="benchmark_results.json",
+                        help="where the results are written (default benchmark_results.json)")
+    parser.add_argument("--baseline", default="benchmark_baseline.json",
+                        help="baseline to compare against (default benchmark_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown reported as slower (default 0.25)")
+    args = parser.parse_args()
+    grid = [tuple(int(x) for x in item.split("x")) for item in args.grid.split(",") if item]
+    den_limits = [int(x) for x in args.den_limits.split(",") if x]
+
+    results = {}
+    for (name, function, bench_args) in benchmark_list(grid, den_limits, args.method,
+                                                       args.r2_search, args.workers):
+        runs = [run_isolated(function, bench_args) for _ in range(max(1, args.repeat))]
+        results[name] = min(runs, key=lambda run: run["wall"])
+        result = results[name]
+        workers = ""
+        if result["worker_peak_mb"] > 0:
+            workers = " ({:.0f} MB for the largest worker)".format(result["worker_peak_mb"])
+        print "{}: {:.3f}s, {:.0f} {}, {:.0f} MB peak{}.".format(name, result["wall"],
+                result["rate"], result["rate_unit"], result["peak_mb"], workers)
+
+    output = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "machine": platform.platform(),
+              "python": platform.python_version(), "numpy": np.__version__,
+              "cpus": multiprocessing.cpu_count(), "benchmarks": results}
+    with open(args.results, "w") as f:
+        json.dump(output, f, indent=1, sort_keys=True, separators=(",", ": "))
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(output, f, indent=1, sort_keys=True, separators=(",", ": "))
+        print "Saved the results as the baseline in {}.".format(args.baseline)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["benchmarks"]
+    failed = False
+    print ""
+    for (name, status, message) in compare_to_baseline(results, baseline, args.tolerance):
+        print "{:7} {}: {}".format(status.upper(), name, message)
+        failed = failed or status == "failed"
+    sys.exit(1 if failed else 0)
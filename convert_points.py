@@ -0,0 +1,55 @@
+'''
+Converts frontier tables between the old text format (like the files in known_points/) and the
+binary format that frontier.py now writes, which has a header with gran, t, dtype and the symmetry
+packing, and which can be memory-mapped.
+
+Usage:
+
+python convert_points.py [--full] [--to-text] <file> [<file> ...]
+
+Text files must be named points_<t>_<gran> (that is where gran and t come from), and each one is
+converted to points_<t>_<gran>.bin next to it. By default only the upper triangle r0 <= r1 is
+stored, since the tables are symmetric; --full stores the whole table. With --to-text, binary files
+are converted back to text instead.
+'''
+
+import argparse
+import frontier_functions as ff
+import os
+
+
+########
+# MAIN #
+########
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert frontier tables between text and "
+                                                 "binary.")
+    parser.add_argument("files", nargs="+", help="tables to convert")
+    parser.add_argument("--full", action="store_true",
+                        help="store the full table, not the triangle")
+    parser.add_argument("--to-text", action="store_true", help="convert binary tables back to text")
+    args = parser.parse_args()
+
+    for filename in args.files:
+        if args.to_text:
+            info = ff.binary_info(filename)
+            if info is None:
+                print "Skipping {}, it is not a binary table.".format(filename)
+                continue
+            out = filename[:-len(".bin")] if filename.endswith(".bin") else filename + ".txt"
+            ff.save_points(out, ff.read_table(filename))
+        else:
+            parts = os.path.basename(filename).split("_")
+            if len(parts) != 3 or parts[0] != "points":
+                print "Skipping {}, the name should be points_<t>_<gran>.".format(filename)
+                continue
+            (t, gran) = (int(parts[1]), int(parts[2]))
+            H = ff.load_points(filename)
+            if H.shape[0] != gran*t+1:
+                print "Skipping {}, its size does not match gran={} and t={}.".format(filename,
+                        gran, t)
+                continue
+            out = filename + ".bin"
+            ff.save_binary(out, H, gran, t, "full" if args.full else "upper")
+        print "Wrote {}.".format(out)
@@ -8,138 +8,180 @@ vector dotted with the adversary's loss vector. The adversary's loss vector's el
 
 Usage:
 
-python frontier.py <granularity>
+python frontier.py <granularity> [-T rounds] [--method search|minmax] [--r2-search linear|bisect]
+                    [--check] [--out-dir dir] [--resume] [--checkpoint-every seconds]
+                    [--workers processes] [--text] [--cache-dir dir] [--cache-budget MB]
+                    [--no-cache] [--warm-start coarse_gran] [--weight-hints] [--headless]
+                    [--instrument file] [--strategy]
 
 where the granularity indicates how many points we want to plot. The code uses matplotlib's surface
 mesh, so having more points increases the chances of getting "better", flatter surfaces, but
 requires heavier computation. If no arguments are specified, then it defaults to granularity = 24.
+
+By default each H[t][r0,r1] is found by searching over r2, either one step at a time or, with
+--r2-search bisect, by bisection (realizability is monotone in r2). With --method minmax, H[t] is
+instead derived from H[t-1] as a whole-table min-max recurrence with no per-cell search. Use --check
+to cross-check every round against the other method and any saved table in known_points/. Since
+rounds taken from the cache or known_points/ are not computed, there would be nothing to check, so
+--check implies --no-cache.
+
+Rounds are computed one at a time for any horizon T (default 2), keeping only H[t-1] and H[t] in
+memory. Each finished round is written to --out-dir as points_<t>_<gran>.bin, a binary table that
+can be memory-mapped (see convert_points.py, or use --text for the old text format). Partially
+finished rounds are checkpointed, so a killed run can be picked up again with --resume. With
+--workers, the r0 rows of each round are searched by a pool of processes (the result is the same as
+a serial run).
+
+Finished rounds are also kept in a persistent cache (--cache-dir, checksummed, and trimmed to
+--cache-budget). A run starts after the highest round it finds there or in known_points/, so
+extending a T=3 run to T=4 only computes one round. Use --no-cache to compute everything.
+
+With --warm-start, say --warm-start 24 for granularity 48, the search upsamples the coarser table of
+each round (from the cache or known_points/) into brackets for every cell, so only a narrow band of
+r2 values gets probed. The brackets are checked, so the result is the same as without them. With
+--weight-hints, each cell first tries the weight vectors that won in the neighboring cells, and the
+hit rates are printed after every round. That only pays off with the linear r2 search at the top of
+the granularity range: it is about 10 % faster at gran 96, about even at gran 72 and slower below.
+With --r2-search bisect, which needs far fewer probes per cell, it is slower at every granularity
+(3.0s instead of 1.9s at gran 48 with T = 3, 7.1s instead of 4.9s at gran 96).
+
+With --headless, the rounds are computed and saved but not plotted, and matplotlib is never imported
+(it is only imported to plot). To use the tables from Python, call compute_frontier() or
+stream_rounds() in frontier_functions.py instead of running this script.
+
+With --instrument, every round and every searched r0 row is appended to the given file as a line of
+JSON: wall time, r2 probes (and the most for any one cell of the row), weight vectors evaluated, and
+how many of those the easy check ruled out versus how many needed lookups into H[t-1].
+
+With --strategy, the winning weight vector of every cell is also saved, as strategy_<t>_<gran>.bin
+next to each round, so that frontier_player.py can play the minimax strategy with one lookup per
+round.
 '''
 
-from mpl_toolkits.mplot3d import Axes3D
-import matplotlib.pyplot as plt
-import numpy as np
+import argparse
+import frontier_functions as ff
+import os
 import sys
 
 
+'''
+Plots the rounds saved in out_dir one at a time, reading each back from its file so that we never
+hold all of them in memory, and being sure to divide by 'gran'! matplotlib is only imported here.
+'''
+def plot_rounds(out_dir, gran, T, binary=True):
+    from mpl_toolkits.mplot3d import Axes3D
+    import matplotlib.pyplot as plt
+    scatter = True
+    surface = False
+    for t in range(1,T+1):
+
+        filename = ff.points_filename(out_dir, t, gran, binary)
+        if not os.path.exists(filename):
+            print "Round {} was not computed or found in the cache, skipping it.".format(t)
+            continue
+        (x,y,z) = ff.frontier_points(ff.read_table(filename), gran)
+
+        if scatter:
+            fig = plt.figure()
+            ax = fig.add_subplot(111, projection='3d')
+            ax.scatter(x,y,z)
+            ax.set_xlim([0,t])
+            ax.set_ylim([0,t])
+            ax.set_zlim([0,t])
+            plt.show()
+
+        if surface:
+            print "Not implemented yet"
+
+
 ########
 # MAIN #
 ########
 
-gran = 24
-if len(sys.argv) == 2:
-    gran = int(sys.argv[1])
-if gran <= 0 or gran >= 100:
-    print "Granularity of " + str(gran) + " would cause problems."
-    sys.exit()
-
-T = 2
-# H[t][r0,r1] gives the minimum r2 (or NaN) for making <r0,r1,r2> optimal in t-round game.
-H = [np.nan] # Putting NaN here as dummy first matrix, because we only want t=1,2,...
-lossPatterns = np.array([[0,0,0],
-                         [1,0,0],
-                         [0,1,0],
-                         [0,0,1],
-                         [1,1,0],
-                         [1,0,1],
-                         [0,1,1]]) # Using <1,1,1> gives same result as <0,0,0> so ignore the former.
-
-for t in range(1,T+1):
-    print "\nCurrently generating samples for round {}.".format(t)
-    H.append(np.empty((gran*t+1, gran*t+1)) * np.nan)
-
-    for r0 in range(0,gran*t+1):
-        print "\rSearching r0 values: {0:.2f} %".format( 100*float(r0)/(gran*t) ),
-        sys.stdout.flush()
-        # Can fill table in from symmetry. If we know H[t][r0,0:r0], we know H[t][0:r0,r0]
-        H[t][r0, 0:r0] = H[t][0:r0, r0]
-
-        for r1 in range(r0,gran*t+1):
-            # Now find a (good) upper bound for r2 so we don't waste too much time searching.
-            # Important: min(any_real_number, np.nan) = any_real_number.
-            ubd = gran*t
-            if r0 > 0:
-                ubd = min(ubd, H[t][r0-1,r1])
-            if r1 > 0:
-                ubd = min(ubd, H[t][r0,r1-1])
-            r2 = ubd
-
-            # Now comes the challening part: finding the best <p0,p1,p2> for this <r0,r1,r2>.
-            # We keep decrementing r2 until we hit a t-unrealizable triple.
-            doneWithDecrements = False
-            while not doneWithDecrements:
-                realizable = False
-                for p0 in range(0, gran+1):
-                    for p1 in range(0, gran-p0+1):
-
-                        p2 = gran-p0-p1
-                        # First do an easy check if adversary can send any component negative
-                        if (r0 < p1+p2) or (r1 < p0+p2) or (r2 < p0+p1):
-                            continue
-                        # If t=1, then we already know we are safe
-                        if t == 1:
-                            realizable = True
-                            break
-                        # Else, for t>1, efficiently compute 7 ways where adversary can "send" <r0,r1,r2>.
-                        ix1 = np.tile(np.array([r0,r1,r2]), (7,1))
-                        ix2 = gran*lossPatterns - np.tile(np.dot(lossPatterns, np.array([[p0],[p1],[p2]])), (1,3))
-                        ix = ix1 - ix2
-                        # Clamp so that we can call same indices using H[t-1] for the testing
-                        ix = np.clip(ix, a_min=None, a_max=(gran*(t-1)))
-                        r0_coords = ix[:,0].ravel().astype(int)
-                        r1_coords = ix[:,1].ravel().astype(int)
-                        # If there are NaNs in the previous matrix, we know <r0,r1,r2>,<p0,p1,p2> can't happen.
-                        nan_indices = np.where( np.isnan(H[t-1][r0_coords,r1_coords]) )[0]
-                        if nan_indices.size == 0:
-                            if np.all( H[t-1][r0_coords,r1_coords] <= ix[:,2] ):
-                                realizable = True
-                                break
-
-                    if realizable:
-                        break
-                # Still in while loop, but finished with looping through <p0,p1,p2>
-                if not realizable: # This means NO <p0,p1,p2> works for this <r0,r1,r2>. Also if r2 = -1.
-                    doneWithDecrements = True
-                else:
-                    r2 = r2 - 1
-            # Finished with while loop, have largest r2 that makes <r0,r1,r2> unrealizable
-            if r2 == gran*t:
-                H[t][r0,r1] = np.nan
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the 3-expert Pareto regret frontier.")
+    parser.add_argument("gran", type=int, nargs="?", default=24, help="granularity (default 24)")
+    parser.add_argument("--method", choices=["search", "minmax"], default="search",
+                        help="search each cell for r2, or use the whole-table min-max recurrence")
+    parser.add_argument("--r2-search", choices=["linear", "bisect"], default="linear",
+                        help="with --method search, decrement r2 one step at a time or bisect "
+                             "on it")
+    parser.add_argument("--check", action="store_true",
+                        help="cross-check each round against the other method and known_points/ "
+                             "(implies --no-cache)")
+    parser.add_argument("-T", type=int, default=2, help="number of rounds (default 2)")
+    parser.add_argument("--out-dir", default=".",
+                        help="where each finished round (and any checkpoint) is written")
+    parser.add_argument("--resume", action="store_true",
+                        help="resume from the last round or r0 row saved in --out-dir")
+    parser.add_argument("--checkpoint-every", type=float, default=60,
+                        help="seconds between checkpoints of a partially finished round")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="with --method search, number of processes to shard the r0 rows "
+                             "across")
+    parser.add_argument("--text", action="store_true",
+                        help="save rounds in the old text format instead of the binary one")
+    parser.add_argument("--cache-dir", default="cache",
+                        help="persistent cache of finished rounds, shared across runs "
+                             "(default cache/)")
+    parser.add_argument("--cache-budget", type=float, default=1024,
+                        help="disk budget for the cache in MB (default 1024)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="neither use the cache nor known_points/, compute every round")
+    parser.add_argument("--warm-start", type=int, metavar="COARSE_GRAN",
+                        help="with --method search, bracket each cell using the (cached) tables "
+                             "at a coarser granularity that divides gran")
+    parser.add_argument("--weight-hints", action="store_true",
+                        help="with --method search, try the neighbor cells' winning weights first "
+                             "and report the hit rates (only faster with linear r2 search at "
+                             "granularities above about 72)")
+    parser.add_argument("--headless", action="store_true",
+                        help="only compute and save the rounds, without plotting or importing "
+                             "matplotlib")
+    parser.add_argument("--instrument", metavar="FILE",
+                        help="append per-round and per-row timings and counters to FILE as JSON "
+                             "lines")
+    parser.add_argument("--strategy", action="store_true",
+                        help="also save the winning weight vector of every cell, for "
+                             "frontier_player.py")
+    args = parser.parse_args()
+    gran = args.gran
+    if gran <= 0 or gran >= 100:
+        print "Granularity of " + str(gran) + " would cause problems."
+        sys.exit()
+
+    # H_t[r0,r1] gives the minimum r2 (or a sentinel) for making <r0,r1,r2> optimal in t-round game.
+    # Only the previous round is kept around; every finished round is saved to
+    # points_<t>_<gran>.bin.
+    T = args.T
+    (cache_dir, known_dirs) = (args.cache_dir, ["known_points"])
+    if args.no_cache or args.check:
+        (cache_dir, known_dirs) = (None, [])
+    if args.warm_start is not None and gran % args.warm_start != 0:
+        print "The warm start granularity must divide " + str(gran) + "."
+        sys.exit()
+    emit = ff.json_lines(args.instrument) if args.instrument else None
+    for (t, H_prev, H_t) in ff.stream_rounds(gran, T, args.method, args.r2_search, args.out_dir,
+                                             args.resume, args.checkpoint_every, args.workers,
+                                             not args.text, cache_dir, int(args.cache_budget*2**20),
+                                             known_dirs, args.warm_start, args.weight_hints,
+                                             emit, args.strategy):
+        if args.check:
+            weights = ff.weight_simplex(gran)
+            if args.method == "minmax":
+                other = ff.search_table(H_prev, t, gran, weights, ff.shift_table(gran, weights),
+                                        args.r2_search)
             else:
-                H[t][r0,r1] = r2+1 # Need next one up for being realizable
-
-# Write to certain files
-# Set up some plots, being sure to divide by 'gran' at the end!
-print "\nAll done with generating points. Now time to plot."
-scatter = True
-surface = False
-save_to_files = True
-for t in range(1,T+1):
-
-    data = H[t]
-    if save_to_files:
-        np.savetxt("points_" + str(t) + "_" + str(gran), data, fmt='%2.f')
-    x = np.array([])
-    y = np.array([])
-    z = np.array([])
-    for i in range(gran*t+1):
-        for j in range(gran*t+1):
-            if not np.isnan(data[i,j]):
-                x = np.append(x,[i])
-                y = np.append(y,[j])
-                z = np.append(z,[data[i,j]])
-    x = x / gran
-    y = y / gran
-    z = z / gran
-
-    if scatter:
-        fig = plt.figure()
-        ax = fig.add_subplot(111, projection='3d')
-        ax.scatter(x,y,z)
-        ax.set_xlim([0,t])
-        ax.set_ylim([0,t])
-        ax.set_zlim([0,t])
-        plt.show()
-
-    if surface:
-        print "Not implemented yet"
-
+                other = ff.minmax_table(H_prev, t, gran, weights)
+            print "\nCells differing from the other method: {}.".format(
+                    ff.compare_tables(H_t, other))
+            known = os.path.join("known_points", "points_" + str(t) + "_" + str(gran))
+            if os.path.exists(known):
+                print "Cells differing from {}: {}.".format(known,
+                        ff.compare_tables(H_t, ff.load_points(known)))
+
+    if args.headless:
+        print "\nAll done with generating points."
+        sys.exit()
+    print "\nAll done with generating points. Now time to plot."
+    plot_rounds(args.out_dir, gran, T, not args.text)
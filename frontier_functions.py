@@ -0,0 +1,988 @@
+'''
+A library of functions for computing the discretized Pareto regret frontier for three experts with
+0/1 loss. These are the building blocks used by frontier.py. All tables here are NUMPY arrays where
+H[r0,r1] is the minimum r2 for making <r0,r1,r2> optimal, with everything scaled by the granularity
+so that the entries are integers in [0, gran*t]. Tables are stored as compact integers (see
+table_dtype) with a sentinel for "unrealizable" cells, which used to be NaNs.
+'''
+
+import hashlib
+import json
+import multiprocessing
+import numpy as np
+import os
+import sys
+import time
+
+# Using <1,1,1> gives same result as <0,0,0> so ignore the former.
+lossPatterns = np.array([[0,0,0],
+                         [1,0,0],
+                         [0,1,0],
+                         [0,0,1],
+                         [1,1,0],
+                         [1,0,1],
+                         [0,1,1]])
+
+'''
+Returns the integer dtype used for a table whose entries go up to max_value: uint16 while it fits
+(with room for the sentinel), else int32. Either way the sentinel for an unrealizable cell is the
+largest value of the dtype, so just like NaN, a test such as H[r0,r1] <= r2 always fails for it, and
+min(r2, H[r0,r1]) always picks r2. Compared to float64 with NaNs, uint16 takes a quarter of the
+memory.
+'''
+def table_dtype(max_value):
+    if max_value < np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.int32
+
+def unrealizable(dtype):
+    return np.iinfo(dtype).max
+
+def new_table(size, dtype):
+    return np.full((size, size), unrealizable(dtype), dtype=dtype)
+
+def is_realizable(H):
+    return H != unrealizable(H.dtype)
+
+'''
+Converts between integer tables and the float tables with NaNs that we used to store (and that are
+still in the text files).
+'''
+def to_float(H):
+    return np.where(is_realizable(H), H, np.nan)
+
+def from_float(H, dtype=None):
+    realizable = ~np.isnan(H)
+    if dtype is None:
+        dtype = table_dtype(np.max(H[realizable]) if np.any(realizable) else 0)
+    table = np.full(H.shape, unrealizable(dtype), dtype=dtype)
+    table[realizable] = H[realizable]
+    return table
+
+'''
+Because H[r0,r1] = H[r1,r0], we only need to store the upper triangle r0 <= r1. pack_upper() gives
+those cells as a flat array in row-major order, and unpack_upper() rebuilds the full table.
+'''
+def pack_upper(H):
+    return H[np.triu_indices(H.shape[0])]
+
+def unpack_upper(packed, size):
+    H = np.empty((size, size), dtype=packed.dtype)
+    upper = np.triu_indices(size)
+    H[upper] = packed
+    H.T[upper] = packed
+    return H
+
+# How far (in max-norm over <p0,p1,p2>) realizing_weight() looks around a hint before a full scan.
+NEAR_RADIUS = 2
+
+'''
+Returns all of the ~gran^2/2 weight vectors <p0,p1,p2> with p0+p1+p2 = gran as an (M,3) integer
+array. The order is the same as the nested "for p0 / for p1" loops, i.e., p0 increases slowest.
+'''
+def weight_simplex(gran):
+    weights = [(p0, p1, gran-p0-p1) for p0 in range(gran+1) for p1 in range(gran-p0+1)]
+    return np.array(weights, dtype=int)
+
+'''
+Precomputes the shift table for the weight vectors. Entry [m,k,:] is how much the adversary's loss
+pattern k moves a point when the player uses weights[m], i.e., gran*lossPatterns[k] minus the
+player's loss <lossPatterns[k],weights[m]>. A point <r0,r1,r2> gets "sent" to <r0,r1,r2> - shift.
+'''
+def shift_table(gran, weights):
+    player_loss = np.dot(weights, lossPatterns.T)
+    return gran*lossPatterns[np.newaxis,:,:] - player_loss[:,:,np.newaxis]
+
+'''
+Tests the triple <r0,r1,r2> against ALL weight vectors at once for a t-round game, where H_prev is
+the table for round t-1 (ignored when t=1). Returns the index (into weights) of a weight vector that
+realizes the triple, or -1 if none of them do.
+
+First we do an easy check if the adversary can send any component negative. For t>1 we then compute
+the 7 ways the adversary can "send" <r0,r1,r2> and clamp so that we can use H_prev for the test. If
+any of those lands on an unrealizable cell in H_prev, the weight vector fails (the sentinel is
+bigger than any r2).
+
+The winning weight vector changes slowly from cell to cell, so hints (indices of weight vectors that
+won nearby) can be given. We try those first, then the ring of weight vectors within NEAR_RADIUS of
+the first hint, and only then scan the rest of the simplex, taking the winner nearest to the hint.
+(Spiraling out in more rings costs more than it saves: every cell needs at least one unrealizable
+probe, which has to look at every weight vector anyway.) Without hints, we return the first
+realizing weight vector in the order of weight_simplex(). If stats is a dict, we count in it how
+each call was settled: "hint", "near", "far" (full scan), "miss" (unrealizable) or "scan" (no hints,
+so one full scan). We also count the calls ("probes"), the weight vectors evaluated ("weights"), how
+many of those the easy check ruled out ("precheck_skips") and how many needed lookups into H_prev
+("lookups"), see INSTRUMENT_KEYS.
+'''
+def realizing_weight(r0, r1, r2, t, gran, H_prev, weights, shifts, hints=(), stats=None):
+    r = np.array([r0, r1, r2], dtype=int)
+    hints = [m for m in hints if m >= 0]
+    _count(stats, "probes")
+    if not hints:
+        m = _first_realizing(r, t, gran, H_prev, weights, shifts, None, stats=stats)
+        _count(stats, "scan")
+        return m
+    m = _first_realizing(r, t, gran, H_prev, weights, shifts, np.array(hints), stats=stats)
+    if m >= 0:
+        _count(stats, "hint")
+        return m
+    distance = np.max(np.abs(weights - weights[hints[0]]), axis=1)
+    ring = np.nonzero((distance > 0) & (distance <= NEAR_RADIUS))[0]
+    m = _first_realizing(r, t, gran, H_prev, weights, shifts, ring, stats=stats)
+    if m >= 0:
+        _count(stats, "near")
+        return m
+    # The rest of the simplex in one vectorized scan, taking the nearest winner.
+    m = _first_realizing(r, t, gran, H_prev, weights, shifts, None, distance, stats)
+    _count(stats, "far" if m >= 0 else "miss")
+    return m
+
+def _first_realizing(r, t, gran, H_prev, weights, shifts, subset, distance=None, stats=None):
+    if subset is None:
+        candidates = np.nonzero(np.all(weights >= gran - r, axis=1))[0]
+    else:
+        candidates = subset[np.all(weights[subset] >= gran - r, axis=1)]
+    if stats is not None:
+        evaluated = len(weights) if subset is None else len(subset)
+        _count(stats, "weights", evaluated)
+        _count(stats, "precheck_skips", evaluated - candidates.size)
+        if t > 1:
+            _count(stats, "lookups", candidates.size)
+    if candidates.size > 0 and t > 1:
+        ix = np.minimum(r - shifts[candidates], gran*(t-1))
+        values = H_prev[ix[:,:,0], ix[:,:,1]]
+        candidates = candidates[np.all(values <= ix[:,:,2], axis=1)]
+    if candidates.size == 0:
+        return -1
+    if distance is not None:
+        return candidates[np.argmin(distance[candidates])]
+    return candidates[0]
+
+def _count(stats, key, n=1):
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + n
+
+'''
+Instrumentation. The counters that realizing_weight() keeps in stats, which the search reports per
+r0 row and per round if it is given an emit function: emit(event) is called with a dict for every
+finished row ("event": "row") and round ("event": "round"), with the wall time in seconds and the
+counters for that row or round. Rows also report their number of cells and the most r2 probes any
+one cell needed. Use json_lines() to get an emit function that appends the events to a file, one
+JSON object per line, or pass any callable to profile the search in-process.
+'''
+INSTRUMENT_KEYS = ("probes", "weights", "precheck_skips", "lookups")
+
+def json_lines(filename):
+    f = open(filename, "a")
+    def emit(event):
+        f.write(json.dumps(event, sort_keys=True) + "\n")
+        f.flush()
+    return emit
+
+def _row_event(gran, t, r0, seconds, cells, max_probes, stats, before):
+    event = {"event": "row", "gran": gran, "t": t, "r0": r0, "seconds": seconds, "cells": cells,
+             "max_probes": max_probes, "time": time.time()}
+    for key in INSTRUMENT_KEYS:
+        event[key] = stats.get(key, 0) - before.get(key, 0)
+    return event
+
+'''
+Prints how the weight-vector searches of a round were settled (see realizing_weight), i.e., how many
+full scans of the simplex the neighbor hints saved.
+'''
+def report_hint_stats(stats):
+    found = sum(stats.get(key, 0) for key in ("hint", "near", "far", "scan"))
+    if found == 0:
+        return
+    print "\nRealizable probes: {}, found from a neighbor's weights: {:.1f} %, nearby: {:.1f} %, " \
+          "needing a full scan: {:.1f} %. Unrealizable probes: {}.".format(found,
+            100.0*stats.get("hint", 0)/found, 100.0*stats.get("near", 0)/found,
+            100.0*(stats.get("far", 0) + stats.get("scan", 0))/found, stats.get("miss", 0))
+
+'''
+Computes the table H_t for a t-round game from H_prev by searching, cell by cell, for the smallest
+r2 that makes <r0,r1,r2> realizable. Only cells with r0 <= r1 are searched, the rest come from
+symmetry. Starting from a (good) upper bound for r2 taken from the neighboring cells, we either keep
+decrementing r2 until we hit a t-unrealizable triple (r2_search="linear"), or bisect between that
+upper bound and a lower bound (r2_search="bisect"). Bisection is valid because realizability is
+monotone in r2, and it needs only a logarithmic number of scans per cell.
+
+To resume a partially computed table, pass it as H_t along with the first r0 row still to do (and
+stop_row to only do the rows before it). If row_done is given, it is called as row_done(r0, H_t)
+after each finished row (for checkpointing). If brackets (from coarse_brackets) are given, every
+cell is bisected within them instead.
+
+A worker that only searches the rows start_row,...,stop_row-1 can pass a row window as H_t instead
+of the whole table: with row_offset, H_t[r0-row_offset] holds row r0 (and the same goes for W). The
+search only looks at the row above and the current one, so a window starting at start_row-1 is all
+it needs, and the rows before it count as unknown.
+
+With weight_hints, we remember the winning weight vector of every cell and pass those of the
+neighboring cells to realizing_weight() as hints, and stats (a dict) collects how often they help.
+With emit, every finished row is reported as an event (see INSTRUMENT_KEYS). If W is given (an int32
+table filled with -1), the winning weight vector of every searched cell is recorded in it, which is
+the strategy table (see fill_winners).
+'''
+def search_table(H_prev, t, gran, weights, shifts, r2_search="linear", start_row=0, H_t=None,
+                 row_done=None, stop_row=None, show_progress=True, brackets=None,
+                 weight_hints=False, stats=None, emit=None, W=None, row_offset=0):
+    if emit is not None and stats is None:
+        stats = {}
+    if H_t is None:
+        H_t = new_table(gran*t+1, table_dtype(gran*t))
+    missing = unrealizable(H_t.dtype)
+    if stop_row is None:
+        stop_row = gran*t+1
+    # W[r0,r1] is the index of the winning weight vector for H_t[r0,r1] (-1 if unknown). It takes
+    # twice the memory of a uint16 H_t, so we only keep it for the hints or the strategy tables.
+    if W is None and weight_hints:
+        W = np.full(H_t.shape, -1, dtype=np.int32)
+
+    for r0 in range(start_row,stop_row):
+        if show_progress:
+            print "\rSearching r0 values: {0:.2f} %".format( 100*float(r0)/(gran*t) ),
+            sys.stdout.flush()
+        # Can fill table in from symmetry. If we know H_t[r0,0:r0], we know H_t[0:r0,r0]
+        (i, lo) = (r0 - row_offset, row_offset)
+        H_t[i, lo:r0] = H_t[0:i, r0]
+        if W is not None:
+            W[i, lo:r0] = _mirror_weights(W[0:i, r0], weights)
+        if emit is not None:
+            (row_start, row_before, max_probes) = (time.time(), dict(stats), 0)
+
+        for r1 in range(r0,gran*t+1):
+            if emit is not None:
+                probes_before = stats.get("probes", 0)
+            # Important: min(gran*t, unrealizable sentinel) = gran*t. A neighbor's winning weight
+            # vector also works here at r2 = ubd, since the table is nonincreasing.
+            (ubd, ubd_weight) = (gran*t, -1)
+            if i > 0 and H_t[i-1,r1] < ubd:
+                (ubd, ubd_weight) = (int(H_t[i-1,r1]), -1 if W is None else W[i-1,r1])
+            if r1 > 0 and H_t[i,r1-1] < ubd:
+                (ubd, ubd_weight) = (int(H_t[i,r1-1]), -1 if W is None else W[i,r1-1])
+            hints = ()
+            if weight_hints:
+                hints = [ubd_weight, W[i-1,r1] if i > 0 else -1, W[i,r1-1] if r1 > 0 else -1]
+            if brackets is not None:
+                if brackets[0][r0,r1] < ubd:
+                    (ubd, ubd_weight) = (int(brackets[0][r0,r1]), -1)
+                (r2, m) = bisect_r2(r0, r1, ubd, t, gran, H_prev, weights, shifts,
+                                    brackets[1][r0,r1], hints, stats, ubd_weight)
+            elif r2_search == "bisect":
+                (r2, m) = bisect_r2(r0, r1, ubd, t, gran, H_prev, weights, shifts, -1, hints, stats,
+                                    ubd_weight)
+            else:
+                (r2, m) = decrement_r2(r0, r1, ubd, t, gran, H_prev, weights, shifts, hints, stats)
+            H_t[i,r1] = r2 if r2 >= 0 else missing
+            if W is not None:
+                W[i,r1] = m
+            if emit is not None:
+                max_probes = max(max_probes, stats.get("probes", 0) - probes_before)
+        if emit is not None:
+            emit(_row_event(gran, t, r0, time.time() - row_start, gran*t+1-r0, max_probes, stats,
+                            row_before))
+        if row_done is not None:
+            row_done(r0, H_t)
+    return H_t
+
+'''
+The weight vectors that win at H[r1,r0] are the ones that win at H[r0,r1] with p0 and p1 swapped.
+'''
+def _mirror_weights(indices, weights):
+    gran = weights[0].sum()
+    (p0, p1) = (weights[indices,0], weights[indices,1])
+    # In weight_simplex() order, <p0,p1,p2> is at index p0*(gran+1) - p0*(p0-1)/2 + p1.
+    mirrored = p1*(gran+1) - p1*(p1-1)//2 + p0
+    return np.where(indices >= 0, mirrored, -1)
+
+'''
+Finds the smallest realizable r2 at <r0,r1> by decrementing r2 from the upper bound ubd until we hit
+a t-unrealizable triple. Returns (r2, m), where m is the index of a weight vector that realizes r2,
+or (-1, -1) if even r2 = gran*t is unrealizable. Each winning weight vector becomes the first hint
+for the next probe.
+'''
+def decrement_r2(r0, r1, ubd, t, gran, H_prev, weights, shifts, hints=(), stats=None):
+    r2 = ubd
+    winner = -1
+    hints = list(hints)
+    doneWithDecrements = False
+    while not doneWithDecrements:
+        m = realizing_weight(r0, r1, r2, t, gran, H_prev, weights, shifts, hints, stats)
+        if m < 0: # This means NO <p0,p1,p2> works for this <r0,r1,r2>. Also if r2 = -1.
+            doneWithDecrements = True
+        else:
+            r2 = r2 - 1
+            winner = m
+            if hints:
+                hints.insert(0, m)
+    # Finished with while loop, have largest r2 that makes <r0,r1,r2> unrealizable
+    if r2 == gran*t:
+        return (-1, -1)
+    return (r2+1, winner) # Need next one up for being realizable
+
+'''
+Finds the smallest realizable r2 at <r0,r1> by bisection. The invariant is that lo is unrealizable
+and hi is realizable. Any r2 < p0+p1 fails the easy check for every weight vector, and since
+p0 >= gran-r0 and p1 >= gran-r1 are needed, every r2 below 2*gran-r0-r1 is unrealizable. The
+neighbor-derived bound is usually tight, so we first gallop down from ubd (steps of 1,2,4,...) to
+bracket the answer, and only then bisect. If ubd came from a neighbor it is realizable by
+monotonicity; if it is gran*t and unrealizable, we return -1.
+
+A guess lbd for a tighter lower bound can also be given. We never gallop past it: when the next step
+would go below lbd we probe lbd itself instead, and if it turns out to be realizable we just keep
+galloping from there, so a bad guess never changes the answer.
+
+Like decrement_r2(), this returns (r2, m) and passes hints along. If ubd is never probed, m is the
+ubd_weight that the neighbor gave us.
+'''
+def bisect_r2(r0, r1, ubd, t, gran, H_prev, weights, shifts, lbd=-1, hints=(), stats=None,
+              ubd_weight=-1):
+    hints = list(hints)
+    winner = ubd_weight
+    if ubd == gran*t:
+        winner = realizing_weight(r0, r1, ubd, t, gran, H_prev, weights, shifts, hints, stats)
+        if winner < 0:
+            return (-1, -1)
+    (lo,hi) = (max(0, 2*gran-r0-r1) - 1, ubd)
+    def probe_at(r2):
+        m = realizing_weight(r0, r1, r2, t, gran, H_prev, weights, shifts, hints, stats)
+        if m >= 0 and hints:
+            hints.insert(0, m)
+        return m
+    step = 1
+    while hi - step > lo:
+        probe = hi-step
+        if probe < lbd < hi:
+            probe = int(lbd)
+        m = probe_at(probe)
+        if m < 0:
+            lo = probe
+            break
+        (hi, winner) = (probe, m)
+        step = 2*step
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        m = probe_at(mid)
+        if m >= 0:
+            (hi, winner) = (mid, m)
+        else:
+            lo = mid
+    return (hi, winner)
+
+'''
+Upsamples the table H_coarse for round t at granularity gran/factor into brackets for the table at
+granularity gran, so that the search only has to probe a narrow band. Returns (upper, lower) arrays.
+
+Any coarse strategy is also a fine one (just multiply the weights by factor), so by induction on t,
+H[factor*r0,factor*r1] <= factor*H_coarse[r0,r1], and since the tables are nonincreasing,
+upper[R0,R1] = factor*H_coarse[R0//factor,R1//factor] is a true upper bound (gran*t where the coarse
+cell is unrealizable). The reverse does not hold, since finer weights can do a bit better, so lower
+is only a guess: factor*H_coarse at the rounded-up coarse cell, minus margin (default factor*t), or
+-1 where there is no guess. bisect_r2() checks the guess before relying on it.
+'''
+def coarse_brackets(H_coarse, factor, t, gran, margin=None):
+    if margin is None:
+        margin = factor*t
+    size = gran*t+1
+    coarse = np.arange(size) // factor
+    coarse_up = np.minimum(-(-np.arange(size) // factor), H_coarse.shape[0]-1)
+    realizable = is_realizable(H_coarse)
+    H_coarse = H_coarse.astype(np.int64)
+    upper = np.where(realizable[np.ix_(coarse,coarse)], factor*H_coarse[np.ix_(coarse,coarse)],
+                     gran*t)
+    lower = np.where(realizable[np.ix_(coarse_up,coarse_up)],
+                     factor*H_coarse[np.ix_(coarse_up,coarse_up)] - margin, -1)
+    lower = np.minimum(lower, upper-1)
+    return (np.minimum(upper, gran*t), lower)
+
+'''
+The same as search_table(), but the r0 rows are split into blocks that are searched by a pool of
+worker processes. Rows only use the row above as an upper-bound hint, so the first row of each block
+just starts from a looser bound, and the result is exactly the same as the serial search. H_prev is
+read-only, so we save it once to a .npy file in tmp_dir that every worker memory-maps, rather than
+pickling it to each of them (and the same goes for brackets). Blocks can finish out of order, so
+row_done(r0, H_t) is only called once every row up to and including r0 is finished. The workers
+collect their row events, which are passed on to emit as each block comes back, and if W is given,
+they also send back the winning weight vectors of their rows.
+'''
+def parallel_search_table(H_prev, t, gran, workers, r2_search="linear", start_row=0, H_t=None,
+                          row_done=None, tmp_dir=".", brackets=None, weight_hints=False,
+                          stats=None, emit=None, W=None):
+    size = gran*t+1
+    if H_t is None:
+        H_t = new_table(size, table_dtype(gran*t))
+    shared = os.path.join(tmp_dir, "shared_" + str(t-1) + "_" + str(gran) + ".npy")
+    if t > 1:
+        np.save(shared, H_prev)
+    else:
+        np.save(shared, new_table(1, np.uint16))
+    shared_brackets = None
+    if brackets is not None:
+        shared_brackets = os.path.join(tmp_dir, "brackets_" + str(t) + "_" + str(gran) + ".npy")
+        np.save(shared_brackets, np.array(brackets, dtype=np.int32))
+
+    # Many small blocks, because the rows with small r0 are the longest ones.
+    block = max(1, (size-start_row) // (8*workers))
+    jobs = [(r0, min(r0+block, size), t, r2_search, weight_hints, emit is not None, W is not None)
+            for r0 in range(start_row, size, block)]
+    finished = {}
+    next_row = start_row
+    pool = multiprocessing.Pool(workers, _init_search_worker, (shared, gran, shared_brackets))
+    try:
+        for (first, rows, block_stats, events, winners) in pool.imap_unordered(_search_rows, jobs):
+            if stats is not None:
+                for key in block_stats:
+                    stats[key] = stats.get(key, 0) + block_stats[key]
+            for event in events:
+                emit(event)
+            for (i, row) in enumerate(rows):
+                H_t[first+i, first+i:] = row[first+i:]
+                if W is not None:
+                    W[first+i, first+i:] = winners[i][first+i:]
+            finished[first] = len(rows)
+            while next_row in finished:
+                next_row += finished.pop(next_row)
+                if row_done is not None:
+                    row_done(next_row-1, H_t)
+            print "\rSearching r0 values: {0:.2f} %".format( 100*float(next_row)/size ),
+            sys.stdout.flush()
+    finally:
+        pool.terminate()
+        pool.join()
+        os.remove(shared)
+        if shared_brackets is not None:
+            os.remove(shared_brackets)
+
+    # The workers only fill in r0 <= r1, so get the rest from symmetry.
+    lower = np.tril_indices(size, -1)
+    H_t[lower] = H_t.T[lower]
+    if W is not None:
+        W[lower] = _mirror_weights(W.T[lower], weight_simplex(gran))
+    return H_t
+
+_search_worker = {}
+
+def _init_search_worker(shared, gran, shared_brackets):
+    _search_worker["H_prev"] = np.load(shared, mmap_mode='r')
+    _search_worker["brackets"] = None
+    if shared_brackets is not None:
+        _search_worker["brackets"] = np.load(shared_brackets, mmap_mode='r')
+    _search_worker["gran"] = gran
+    _search_worker["weights"] = weight_simplex(gran)
+    _search_worker["shifts"] = shift_table(gran, _search_worker["weights"])
+
+def _search_rows(job):
+    (first, last, t, r2_search, weight_hints, instrument, strategy) = job
+    w = _search_worker
+    # We search in a private window of the rows of this block plus the (unknown) row above, so a
+    # worker's memory is O(block*size), and only the rows of the block get sent back.
+    (stats, events) = ({}, [])
+    (size, offset) = (w["gran"]*t+1, max(0, first-1))
+    H_t = np.full((last-offset, size), unrealizable(table_dtype(w["gran"]*t)),
+                  dtype=table_dtype(w["gran"]*t))
+    W = None
+    if weight_hints or strategy:
+        W = np.full((last-offset, size), -1, dtype=np.int32)
+    search_table(w["H_prev"], t, w["gran"], w["weights"], w["shifts"], r2_search,
+                 start_row=first, H_t=H_t, stop_row=last, show_progress=False,
+                 brackets=w["brackets"], weight_hints=weight_hints, stats=stats,
+                 emit=events.append if instrument else None, W=W, row_offset=offset)
+    rows = slice(first-offset, last-offset)
+    return (first, H_t[rows], stats, events, W[rows] if strategy else None)
+
+'''
+Computes the table H_t for a t-round game directly from H_prev, without searching over r2. For a
+fixed weight vector <p0,p1,p2>, the smallest r2 that works at <r0,r1> is the max over the loss
+patterns of the shifted H_prev plus that pattern's offset (and p0+p1, from the easy check). Then
+H_t is the min of these tables over all weight vectors. This gives the same table as search_table(),
+but each weight vector costs a few whole-array operations instead of many scalar probes per cell.
+If W is given (an int32 table), the index of the first weight vector attaining the min is recorded
+in every cell, -1 where none does.
+'''
+def minmax_table(H_prev, t, gran, weights, W=None):
+    size = gran*t+1
+    r = np.arange(size)
+    # Work in int64, so nothing can wrap around. The sentinel of H_prev's dtype (65535 for uint16)
+    # is not far above gran*t, so unrealizable cells get a value that stays far above it when
+    # shifted, instead.
+    H_t = np.full((size, size), unrealizable(np.int64))
+    if t > 1:
+        H_prev = np.where(is_realizable(H_prev), H_prev.astype(np.int64),
+                          unrealizable(np.int64) // 2)
+
+    for (m, (p0,p1,p2)) in enumerate(weights):
+        # The easy check: the adversary can't send any component negative, so only the block with
+        # r0 >= p1+p2 and r1 >= p0+p2 can be realized with this weight vector.
+        (a0,a1) = (p1+p2, p0+p2)
+        need = np.full((size-a0, size-a1), p0+p1, dtype=np.int64)
+        if t > 1:
+            for pattern in lossPatterns:
+                offset = np.dot(pattern, [p0,p1,p2])
+                ix0 = np.minimum(r[a0:] - gran*pattern[0] + offset, gran*(t-1))
+                ix1 = np.minimum(r[a1:] - gran*pattern[1] + offset, gran*(t-1))
+                need = np.maximum(need, H_prev[np.ix_(ix0,ix1)] + gran*pattern[2] - offset)
+        if W is not None:
+            W[a0:,a1:][need < H_t[a0:,a1:]] = m
+        H_t[a0:,a1:] = np.minimum(H_t[a0:,a1:], need)
+
+    if W is not None:
+        W[H_t > gran*t] = -1
+    dtype = table_dtype(gran*t)
+    H_t[H_t > gran*t] = unrealizable(dtype)
+    return H_t.astype(dtype)
+
+'''
+Loads a table saved by frontier.py (e.g., known_points/points_2_24) as an integer table. The text
+files use NaN for unrealizable cells.
+'''
+def load_points(filename):
+    return from_float(np.loadtxt(filename))
+
+'''
+Saves a table in the same text format as known_points/. We write to a temporary file first and then
+rename it, so a run that gets killed never leaves a half-written table behind.
+'''
+def save_points(filename, H_t):
+    np.savetxt(filename + ".tmp", to_float(H_t), fmt='%2.f')
+    os.rename(filename + ".tmp", filename)
+
+'''
+The binary table format. A file starts with a HEADER_SIZE byte text header such as
+
+PRFTABLE gran=24 t=2 dtype=<u2 packing=upper
+
+padded with spaces and ending in a newline, followed by the raw little-endian table. With
+packing=full that is the whole (gran*t+1) x (gran*t+1) table in row-major order, and with
+packing=upper it is only the r0 <= r1 triangle, as given by pack_upper(). Since there is nothing to
+parse after the header, the table can be memory-mapped and tools can read just the slices they need.
+
+Tables for K experts (see frontier_k.py) have packing=sorted and an extra experts=K field. For
+those, H is passed in already packed: one entry per sorted tuple r0 <= r1 <= ... <= r_{K-2}.
+Strategy tables (see save_strategy) have an extra kind=strategy field.
+'''
+BINARY_MAGIC = "PRFTABLE"
+HEADER_SIZE = 128
+
+def save_binary(filename, H, gran, t, packing="upper", experts=3, kind=None):
+    dtype = np.dtype(H.dtype).newbyteorder('<')
+    header = "{} gran={} t={} dtype={} packing={}".format(BINARY_MAGIC, gran, t, dtype.str, packing)
+    if experts != 3:
+        header += " experts={}".format(experts)
+    if kind is not None:
+        header += " kind={}".format(kind)
+    data = pack_upper(H) if packing == "upper" else H
+    f = open(filename + ".tmp", 'wb')
+    f.write(header.ljust(HEADER_SIZE-1) + "\n")
+    data.astype(dtype).tofile(f)
+    f.close()
+    os.rename(filename + ".tmp", filename)
+
+'''
+Reads the header of a binary table and returns a dict with gran, t, size, dtype and packing. Returns
+None if the file is not in the binary format (e.g., one of the old text files).
+'''
+def binary_info(filename):
+    f = open(filename, 'rb')
+    header = f.read(HEADER_SIZE)
+    f.close()
+    fields = header.split()
+    if len(header) < HEADER_SIZE or not fields or fields[0] != BINARY_MAGIC:
+        return None
+    info = dict(field.split("=", 1) for field in fields[1:])
+    (info["gran"], info["t"]) = (int(info["gran"]), int(info["t"]))
+    info["size"] = info["gran"]*info["t"] + 1
+    info["dtype"] = np.dtype(info["dtype"])
+    info["experts"] = int(info.get("experts", 3))
+    return info
+
+'''
+The number of sorted tuples of length d with entries in range(n), i.e., (n+d-1) choose d.
+'''
+def multiset_count(n, d):
+    count = 1
+    for i in range(d):
+        count = count * (n+i) // (i+1)
+    return count
+
+'''
+Loads a binary table without unpacking it. Returns (info, data), where data is the 2-D table for
+packing=full or the flat upper triangle for packing=upper (or the flat sorted tuples for
+packing=sorted). With mmap=True (the default) nothing is read until it is used; use upper_row() to
+get one row of a packed table.
+'''
+def load_binary(filename, mmap=True):
+    info = binary_info(filename)
+    if info is None:
+        raise ValueError(filename + " is not a binary frontier table.")
+    size = info["size"]
+    if info["packing"] == "sorted":
+        shape = (multiset_count(size, info["experts"]-1),)
+    elif info["packing"] == "upper":
+        shape = (size*(size+1)//2,)
+    else:
+        shape = (size, size)
+    if mmap:
+        data = np.memmap(filename, dtype=info["dtype"], mode='r', offset=HEADER_SIZE, shape=shape)
+    else:
+        f = open(filename, 'rb')
+        f.seek(HEADER_SIZE)
+        data = np.fromfile(f, dtype=info["dtype"], count=int(np.prod(shape))).reshape(shape)
+        f.close()
+    return (info, data)
+
+'''
+Returns H[r0,r0:] from a table packed with pack_upper(), without touching any other row.
+'''
+def upper_row(packed, r0, size):
+    start = r0*size - r0*(r0-1)//2
+    return packed[start:start+size-r0]
+
+'''
+Loads a full integer table from either format: a binary table or a text file like the ones in
+known_points/.
+'''
+def read_table(filename):
+    info = binary_info(filename)
+    if info is None:
+        return load_points(filename)
+    if info["packing"] == "sorted":
+        raise ValueError(filename + " is a K-expert table, load it with frontier_k.load_table().")
+    if info.get("kind") == "strategy":
+        raise ValueError(filename + " is a strategy table, load it with load_strategy().")
+    (info, data) = load_binary(filename, mmap=False)
+    if info["packing"] == "upper":
+        return unpack_upper(data, info["size"])
+    return data
+
+'''
+Strategy tables. W[t][r0,r1] is the index (into weight_simplex(gran)) of a weight vector that
+realizes <r0,r1,H[t][r0,r1]> for t rounds, or -1 where the cell is unrealizable. Such a weight
+vector also realizes <r0,r1,r2> for any larger r2, so a player who is at <r0,r1,r2> with t rounds to
+go can just look it up (see frontier_player.py) instead of searching the simplex again.
+
+fill_winners() finds a winner for every realizable cell of W that doesn't have one yet (e.g., the
+rows a resumed search did not redo, or rounds that came from the cache), one full scan per cell, and
+returns W. The tables are saved as the upper triangle of uint16 indices with the dtype's maximum for
+-1, and load_strategy() rebuilds the lower triangle by swapping p0 and p1.
+'''
+def fill_winners(W, H_t, H_prev, t, gran, weights, shifts):
+    (rows, cols) = np.nonzero(is_realizable(H_t) & (W < 0))
+    for (r0, r1) in zip(rows, cols):
+        W[r0,r1] = realizing_weight(r0, r1, int(H_t[r0,r1]), t, gran, H_prev, weights, shifts)
+    return W
+
+def strategy_filename(out_dir, t, gran):
+    return os.path.join(out_dir, "strategy_" + str(t) + "_" + str(gran) + ".bin")
+
+def save_strategy(filename, W, gran, t):
+    W = np.where(W >= 0, W, unrealizable(np.uint16)).astype(np.uint16)
+    save_binary(filename, W, gran, t, "upper", kind="strategy")
+
+def load_strategy(filename):
+    info = binary_info(filename)
+    if info is None or info.get("kind") != "strategy":
+        raise ValueError(filename + " is not a strategy table.")
+    (info, packed) = load_binary(filename, mmap=False)
+    packed = np.where(packed != unrealizable(info["dtype"]), packed, -1).astype(np.int32)
+    W = unpack_upper(packed, info["size"])
+    lower = np.tril_indices(info["size"], -1)
+    W[lower] = _mirror_weights(W.T[lower], weight_simplex(info["gran"]))
+    return W
+
+'''
+The file names used for the finished table of round t (binary tables get a .bin extension), and for
+the checkpoint of a partially finished round (which also records the last finished r0 row).
+Checkpoints only store the upper triangle of the table.
+'''
+def points_filename(out_dir, t, gran, binary=True):
+    name = os.path.join(out_dir, "points_" + str(t) + "_" + str(gran))
+    return name + ".bin" if binary else name
+
+def partial_filename(out_dir, t, gran):
+    return os.path.join(out_dir, "partial_" + str(t) + "_" + str(gran) + ".npz")
+
+'''
+A persistent cache of finished rounds that is shared across runs. Tables are kept in cache_dir as
+binary files points_<t>_<gran>.bin, and cache_dir/index.json records each file's gran, t, size in
+bytes, SHA-1 checksum, and when it was last used. A cached table whose checksum does not match is
+dropped instead of being used. Whenever a round is added, the least recently used tables are evicted
+until the cache fits in max_bytes (but the new table itself is always kept).
+'''
+CACHE_INDEX = "index.json"
+
+def read_cache_index(cache_dir):
+    path = os.path.join(cache_dir, CACHE_INDEX)
+    if not os.path.exists(path):
+        return {}
+    f = open(path)
+    index = json.load(f)
+    f.close()
+    return index
+
+def write_cache_index(cache_dir, index):
+    path = os.path.join(cache_dir, CACHE_INDEX)
+    f = open(path + ".tmp", 'w')
+    json.dump(index, f, indent=1, sort_keys=True)
+    f.close()
+    os.rename(path + ".tmp", path)
+
+def file_checksum(filename):
+    digest = hashlib.sha1()
+    f = open(filename, 'rb')
+    for chunk in iter(lambda: f.read(1 << 20), b""):
+        digest.update(chunk)
+    f.close()
+    return digest.hexdigest()
+
+'''
+Returns the path of the cached table for round t at this granularity, or None if it is not cached
+(or fails its checksum, in which case it is removed).
+'''
+def cache_get(cache_dir, gran, t):
+    index = read_cache_index(cache_dir)
+    name = os.path.basename(points_filename("", t, gran))
+    if name not in index:
+        return None
+    path = os.path.join(cache_dir, name)
+    if os.path.exists(path) and file_checksum(path) == index[name]["sha1"]:
+        index[name]["used"] = time.time()
+        write_cache_index(cache_dir, index)
+        return path
+    print "Dropping cached {}, it is missing or fails its checksum.".format(name)
+    del index[name]
+    if os.path.exists(path):
+        os.remove(path)
+    write_cache_index(cache_dir, index)
+    return None
+
+def cache_put(cache_dir, H_t, gran, t, max_bytes):
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    name = os.path.basename(points_filename("", t, gran))
+    path = os.path.join(cache_dir, name)
+    save_binary(path, H_t, gran, t)
+    index = read_cache_index(cache_dir)
+    index[name] = {"gran": gran, "t": t, "bytes": os.path.getsize(path),
+                   "sha1": file_checksum(path), "used": time.time()}
+    total = sum(entry["bytes"] for entry in index.values())
+    for old in sorted(index, key=lambda key: index[key]["used"]):
+        if total <= max_bytes:
+            break
+        if old == name:
+            continue
+        total -= index[old]["bytes"]
+        if os.path.exists(os.path.join(cache_dir, old)):
+            os.remove(os.path.join(cache_dir, old))
+        del index[old]
+    write_cache_index(cache_dir, index)
+
+'''
+Returns the table for round t at this granularity if we already have it, either in the cache or as a
+text file in one of known_dirs (such as known_points/), and None otherwise. find_cached_round()
+returns (t, H_t) for the highest such round t <= T, or (0, None).
+'''
+def cached_round(cache_dir, gran, t, known_dirs=()):
+    if cache_dir is not None:
+        path = cache_get(cache_dir, gran, t)
+        if path is not None:
+            return read_table(path)
+    for known_dir in known_dirs:
+        path = points_filename(known_dir, t, gran, False)
+        if os.path.exists(path):
+            H_t = read_table(path)
+            if H_t.shape[0] == gran*t+1:
+                return H_t
+    return None
+
+def find_cached_round(cache_dir, gran, T, known_dirs=()):
+    for t in range(T, 0, -1):
+        H_t = cached_round(cache_dir, gran, t, known_dirs)
+        if H_t is not None:
+            return (t, H_t)
+    return (0, None)
+
+'''
+Computes the tables for rounds 1,2,...,T one at a time, keeping only H[t-1] and H[t] in memory. This
+is a generator that yields (t, H_prev, H_t) as each round finishes, and every finished round is
+written to out_dir as points_<t>_<gran>.bin (or as a text file points_<t>_<gran> if binary=False)
+before it is yielded.
+
+With resume=True, we start after the last round already saved in out_dir. With the search method,
+partially finished rounds are also checkpointed (at most once every checkpoint_every seconds) and
+resumed from the last finished r0 row. Rounds that were loaded rather than computed are not yielded.
+With workers > 1, the search method shards the r0 rows of each round across that many processes.
+
+With a cache_dir, we also start after the highest round found by find_cached_round() (copying the
+cached rounds we have into out_dir), and every computed round is added to the cache. That way,
+extending a T=3 run to T=4 only costs one round.
+
+With coarse_gran (which must divide gran), the search method warm-starts each round from the table
+at that coarser granularity, if we have it in the cache or known_dirs (see coarse_brackets). With
+weight_hints, it tries the neighbors' winning weight vectors first and reports how often that helps.
+
+With emit (e.g., from json_lines()), every computed round and every searched r0 row is reported as
+an event, see INSTRUMENT_KEYS. Round events also carry the hint counters of realizing_weight().
+
+With strategy, the winning weight vector of every cell is kept too and written to out_dir as
+strategy_<t>_<gran>.bin for every round (see fill_winners), including rounds that were loaded.
+'''
+def stream_rounds(gran, T, method="search", r2_search="linear", out_dir=".", resume=False,
+                  checkpoint_every=60, workers=1, binary=True, cache_dir=None,
+                  cache_bytes=1 << 30, known_dirs=(), coarse_gran=None, weight_hints=False,
+                  emit=None, strategy=False):
+    if coarse_gran is not None and gran % coarse_gran != 0:
+        raise ValueError("Coarse granularity {} does not divide {}.".format(coarse_gran, gran))
+    weights = weight_simplex(gran)
+    shifts = shift_table(gran, weights)
+    H_prev = None
+    first = 1
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    if resume:
+        while first <= T and os.path.exists(points_filename(out_dir, first, gran, binary)):
+            first += 1
+        if first > 1:
+            print "Resuming after round {} from {}.".format(first-1, out_dir)
+            H_prev = read_table(points_filename(out_dir, first-1, gran, binary))
+    if cache_dir is not None or known_dirs:
+        (cached, H_cached) = find_cached_round(cache_dir, gran, T, known_dirs)
+        if cached >= first:
+            print "Starting after round {}, which was already computed.".format(cached)
+            for t in range(1,cached+1):
+                H_t = H_cached if t == cached else cached_round(cache_dir, gran, t, known_dirs)
+                if H_t is None:
+                    continue
+                if binary:
+                    save_binary(points_filename(out_dir, t, gran), H_t, gran, t)
+                else:
+                    save_points(points_filename(out_dir, t, gran, False), H_t)
+            (first, H_prev) = (cached+1, H_cached)
+    if strategy and first > 1:
+        _ensure_strategies(out_dir, gran, first-1, binary, weights, shifts)
+
+    for t in range(first,T+1):
+        print "\nCurrently generating samples for round {}.".format(t)
+        partial = partial_filename(out_dir, t, gran)
+        # The counters cost a little in the hot path, so only keep them when someone looks.
+        (round_start, stats) = (time.time(), {} if weight_hints or emit is not None else None)
+        W = np.full((gran*t+1, gran*t+1), -1, dtype=np.int32) if strategy else None
+        if method == "minmax":
+            H_t = minmax_table(H_prev, t, gran, weights, W)
+        else:
+            (start_row, H_t) = (0, None)
+            if resume and os.path.exists(partial):
+                saved = np.load(partial)
+                (start_row, H_t) = (int(saved["row"])+1, unpack_upper(saved["H"], gran*t+1))
+                print "Resuming round {} at r0 = {}.".format(t, start_row)
+            brackets = None
+            if coarse_gran is not None:
+                H_coarse = cached_round(cache_dir, coarse_gran, t, known_dirs)
+                if H_coarse is None:
+                    print "No table for round {} at granularity {}, no warm start.".format(t,
+                            coarse_gran)
+                else:
+                    brackets = coarse_brackets(H_coarse, gran // coarse_gran, t, gran)
+            last_save = [time.time()]
+            def row_done(r0, H_partial):
+                if time.time() - last_save[0] >= checkpoint_every:
+                    np.savez(partial + ".tmp.npz", H=pack_upper(H_partial), row=r0)
+                    os.rename(partial + ".tmp.npz", partial)
+                    last_save[0] = time.time()
+            if workers > 1:
+                H_t = parallel_search_table(H_prev, t, gran, workers, r2_search, start_row, H_t,
+                                            row_done, out_dir, brackets, weight_hints, stats, emit,
+                                            W)
+            else:
+                H_t = search_table(H_prev, t, gran, weights, shifts, r2_search, start_row, H_t,
+                                   row_done, brackets=brackets, weight_hints=weight_hints,
+                                   stats=stats, emit=emit, W=W)
+            if weight_hints:
+                report_hint_stats(stats)
+        if emit is not None:
+            event = {"event": "round", "gran": gran, "t": t, "method": method,
+                     "seconds": time.time() - round_start, "time": time.time()}
+            event.update(stats or {})
+            emit(event)
+        if binary:
+            save_binary(points_filename(out_dir, t, gran), H_t, gran, t)
+        else:
+            save_points(points_filename(out_dir, t, gran, False), H_t)
+        if strategy:
+            fill_winners(W, H_t, H_prev, t, gran, weights, shifts)
+            save_strategy(strategy_filename(out_dir, t, gran), W, gran, t)
+        for leftover in (partial, partial + ".tmp.npz"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        if cache_dir is not None:
+            cache_put(cache_dir, H_t, gran, t, cache_bytes)
+        yield (t, H_prev, H_t)
+        H_prev = H_t
+
+'''
+The library entry point. Computes (or loads) the tables for rounds 1,2,...,T with stream_rounds(),
+which takes the same keyword arguments, and returns them as a SavedRounds sequence
+[H[1], ..., H[T]]. This never imports matplotlib.
+'''
+def compute_frontier(gran, T, **options):
+    for _ in stream_rounds(gran, T, **options):
+        pass
+    return SavedRounds(options.get("out_dir", "."), gran, T, options.get("binary", True))
+
+'''
+The rounds saved in out_dir as a read-only sequence, where rounds[t-1] is H[t]. Each table is only
+read from its file when it is indexed (and not kept), so holding the sequence costs nothing, and
+going through it holds one table at a time, as stream_rounds() does. A round that is not in out_dir
+(e.g., a cached round without its predecessors) is None.
+'''
+class SavedRounds(object):
+
+    def __init__(self, out_dir, gran, T, binary=True):
+        (self.out_dir, self.gran, self.T, self.binary) = (out_dir, gran, T, binary)
+
+    def __len__(self):
+        return self.T
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.T
+        if not 0 <= k < self.T:
+            raise IndexError("There are only {} rounds.".format(self.T))
+        filename = points_filename(self.out_dir, k+1, self.gran, self.binary)
+        return read_table(filename) if os.path.exists(filename) else None
+
+'''
+The realizable points <r0,r1,H[r0,r1]> of a table, divided by gran, as three arrays (x,y,z) in
+row-major order. This is what we plot.
+'''
+def frontier_points(H, gran):
+    (x,y) = np.nonzero(is_realizable(H))
+    return (x / float(gran), y / float(gran), H[x,y] / float(gran))
+
+'''
+Writes the strategy tables for the rounds 1,2,...,last saved in out_dir that don't have one yet.
+'''
+def _ensure_strategies(out_dir, gran, last, binary, weights, shifts):
+    H_prev = None
+    for t in range(1,last+1):
+        filename = points_filename(out_dir, t, gran, binary)
+        if not os.path.exists(filename):
+            print "No table for round {}, so no strategy tables before round {}.".format(t, last+1)
+            return
+        H_t = read_table(filename)
+        if not os.path.exists(strategy_filename(out_dir, t, gran)):
+            W = np.full(H_t.shape, -1, dtype=np.int32)
+            fill_winners(W, H_t, H_prev, t, gran, weights, shifts)
+            save_strategy(strategy_filename(out_dir, t, gran), W, gran, t)
+        H_prev = H_t
+
+'''
+Compares two tables cell for cell, treating unrealizable cells as equal even if the dtypes differ.
+Returns the number of cells that differ (or -1 if the shapes don't even match), so 0 means the
+tables are identical.
+'''
+def compare_tables(A, B):
+    if A.shape != B.shape:
+        return -1
+    (realA, realB) = (is_realizable(A), is_realizable(B))
+    same = (realA == realB) & (~realA | (A.astype(np.int64) == B.astype(np.int64)))
+    return int(np.sum(~same))
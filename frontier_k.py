@@ -0,0 +1,232 @@
+'''
+The regret tradeoff profile for K experts, using expert 0/1 loss. This generalizes frontier.py,
+which only handles K = 3.
+
+With K experts, H[t][r0,...,r_{K-2}] is the minimum r_{K-1} for making <r0,...,r_{K-1}> optimal in a
+t-round game, so H[t] is a (K-1)-dimensional table, and there are 2^K-1 loss patterns. Storing and
+searching all of that is out of reach for K = 4 or 5 at any useful granularity. But the frontier is
+symmetric under every permutation of the experts, so H[t] does not change when its arguments are
+permuted, and we only compute and store the cells with r0 <= r1 <= ... <= r_{K-2}. That is roughly
+(K-1)! times less work and memory than the full table (the r0 <= r1 trick of frontier.py is K = 3).
+
+The sorted cells are stored in a flat array in the order of their rank (see cell_rank). Decreasing
+one coordinate of a cell (and sorting again) always gives a smaller rank, so when we go through the
+cells by rank, the neighbors that bound r_{K-1} from above are already done.
+
+Usage:
+
+python frontier_k.py <experts> <granularity> [-T rounds] [--out-dir dir] [--check]
+
+Each finished round is written to --out-dir as points_k<K>_<t>_<gran>.bin, a binary table with
+packing=sorted (see frontier_functions.py). With K = 3, --check compares every round against the
+tables in known_points/.
+'''
+
+import argparse
+import frontier_functions as ff
+import itertools
+import numpy as np
+import os
+import sys
+
+'''
+All 0/1 loss vectors for K experts. Using <1,...,1> gives same result as <0,...,0> so ignore the
+former, which leaves 2^K-1 of them.
+'''
+def loss_patterns(K):
+    return np.array([p for p in itertools.product([0,1], repeat=K) if sum(p) < K])
+
+'''
+All weight vectors <p0,...,p_{K-1}> with entries summing to gran, as an (M,K) integer array, with p0
+increasing slowest. For K = 3 this is the same as frontier_functions.weight_simplex().
+'''
+def weight_simplex(gran, K):
+    if K == 1:
+        return np.array([[gran]], dtype=int)
+    rows = []
+    for p0 in range(gran+1):
+        for rest in weight_simplex(gran-p0, K-1):
+            rows.append([p0] + list(rest))
+    return np.array(rows, dtype=int)
+
+'''
+The same shift table as frontier_functions.shift_table(), for any number of experts.
+'''
+def shift_table(gran, weights, patterns):
+    player_loss = np.dot(weights, patterns.T)
+    return gran*patterns[np.newaxis,:,:] - player_loss[:,:,np.newaxis]
+
+'''
+Returns comb with comb[b,j] = b choose j, for b < n+d and j <= d.
+'''
+def binomials(n, d):
+    comb = np.zeros((n+d, d+1), dtype=np.int64)
+    comb[:,0] = 1
+    for b in range(1, n+d):
+        comb[b,1:] = comb[b-1,1:] + comb[b-1,:-1]
+    return comb
+
+'''
+The rank of sorted cells (the last axis of cells holds a0 <= a1 <= ... <= a_{d-1}) among all sorted
+cells. With b_j = a_j + j, which is strictly increasing, the rank is the sum of (b_j choose j+1).
+The ranks of the cells with entries in range(n) are exactly 0,1,...,multiset_count(n,d)-1.
+'''
+def cell_rank(cells, comb):
+    d = cells.shape[-1]
+    b = cells + np.arange(d)
+    return np.sum(comb[b, np.arange(1, d+1)], axis=-1)
+
+'''
+All sorted cells of dimension d with entries in range(size), as an (N,d) array ordered by rank.
+'''
+def canonical_cells(size, d, comb):
+    cells = np.array(list(itertools.combinations_with_replacement(range(size), d)), dtype=int)
+    return cells[np.argsort(cell_rank(cells, comb))]
+
+'''
+For every cell, the ranks of the (sorted) cells we get by decreasing one of its coordinates, or -1
+where that coordinate is already 0. The table is nonincreasing, so those give upper bounds.
+'''
+def neighbor_ranks(cells, comb):
+    neighbors = np.empty(cells.shape, dtype=np.int64)
+    for i in range(cells.shape[1]):
+        lower = cells.copy()
+        lower[:,i] -= 1
+        valid = lower[:,i] >= 0
+        ranks = cell_rank(np.sort(np.maximum(lower, 0), axis=1), comb)
+        neighbors[:,i] = np.where(valid, ranks, -1)
+    return neighbors
+
+'''
+Tests the point r (all K coordinates) against all weight vectors at once for a t-round game, as in
+frontier_functions.realizing_weight(). The shifted points are looked up in the packed H_prev by
+sorting their first K-1 coordinates. Returns the index of the first realizing weight vector, or -1.
+'''
+def realizing_weight(r, t, gran, H_prev, weights, shifts, comb):
+    candidates = np.nonzero(np.all(weights >= gran - r, axis=1))[0]
+    if candidates.size == 0:
+        return -1
+    if t == 1:
+        return candidates[0]
+    ix = np.minimum(r - shifts[candidates], gran*(t-1))
+    values = H_prev[cell_rank(np.sort(ix[:,:,:-1], axis=2), comb)]
+    hits = np.nonzero(np.all(values <= ix[:,:,-1], axis=1))[0]
+    if hits.size == 0:
+        return -1
+    return candidates[hits[0]]
+
+'''
+Finds the smallest realizable last coordinate for the given cell, galloping down from the upper
+bound ubd and then bisecting, as in frontier_functions.bisect_r2(). Each p_i must be at least
+gran-a_i, and the last coordinate must be at least the sum of the other p_i, which gives the lower
+bound. Returns -1 if even gran*t is unrealizable.
+'''
+def min_last_coordinate(cell, ubd, t, gran, H_prev, weights, shifts, comb):
+    r = np.append(cell, 0)
+    def realizable(last):
+        r[-1] = last
+        return realizing_weight(r, t, gran, H_prev, weights, shifts, comb) >= 0
+    if ubd == gran*t and not realizable(ubd):
+        return -1
+    (lo,hi) = (np.sum(np.maximum(0, gran - cell)) - 1, ubd)
+    step = 1
+    while hi - step > lo:
+        if not realizable(hi-step):
+            lo = hi-step
+            break
+        hi = hi-step
+        step = 2*step
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if realizable(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+'''
+Computes the packed table for a t-round game with K experts from the packed table of round t-1.
+'''
+def next_table(H_prev, t, gran, K, weights, shifts, show_progress=True):
+    size = gran*t+1
+    comb = binomials(size, K-1)
+    cells = canonical_cells(size, K-1, comb)
+    neighbors = neighbor_ranks(cells, comb)
+    dtype = ff.table_dtype(gran*t)
+    missing = ff.unrealizable(dtype)
+    H_t = np.empty(len(cells), dtype=dtype)
+    H_t.fill(missing)
+    every = max(1, len(cells) // 1000)
+
+    for (k, cell) in enumerate(cells):
+        if show_progress and k % every == 0:
+            print "\rSearching cells: {0:.2f} %".format( 100*float(k)/len(cells) ),
+            sys.stdout.flush()
+        # Important: min(gran*t, unrealizable sentinel) = gran*t.
+        ubd = gran*t
+        for neighbor in neighbors[k]:
+            if neighbor >= 0:
+                ubd = min(ubd, int(H_t[neighbor]))
+        last = min_last_coordinate(cell, ubd, t, gran, H_prev, weights, shifts, comb)
+        H_t[k] = last if last >= 0 else missing
+    return H_t
+
+'''
+Expands a packed table into the full (K-1)-dimensional one. Only sensible for small tables, e.g.,
+to compare K = 3 against the 2-D tables of frontier.py.
+'''
+def expand_table(packed, size, K):
+    comb = binomials(size, K-1)
+    cells = np.indices((size,)*(K-1)).reshape(K-1, -1).T
+    return packed[cell_rank(np.sort(cells, axis=1), comb)].reshape((size,)*(K-1))
+
+'''
+Saves and loads packed tables, in the binary format of frontier_functions.py with packing=sorted.
+'''
+def points_filename(out_dir, K, t, gran):
+    return os.path.join(out_dir, "points_k" + str(K) + "_" + str(t) + "_" + str(gran) + ".bin")
+
+def save_table(filename, packed, gran, t, K):
+    ff.save_binary(filename, packed, gran, t, "sorted", K)
+
+def load_table(filename, mmap=True):
+    return ff.load_binary(filename, mmap)
+
+
+########
+# MAIN #
+########
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the K-expert Pareto regret frontier.")
+    parser.add_argument("experts", type=int, help="number of experts K (at least 2)")
+    parser.add_argument("gran", type=int, help="granularity")
+    parser.add_argument("-T", type=int, default=2, help="number of rounds (default 2)")
+    parser.add_argument("--out-dir", default=".", help="where each finished round is written")
+    parser.add_argument("--check", action="store_true",
+                        help="with 3 experts, compare every round against known_points/")
+    args = parser.parse_args()
+    (K, gran, T) = (args.experts, args.gran, args.T)
+    if K < 2 or gran <= 0:
+        print "Can't compute the frontier with {} experts and granularity {}.".format(K, gran)
+        sys.exit()
+    if not os.path.isdir(args.out_dir):
+        os.makedirs(args.out_dir)
+
+    weights = weight_simplex(gran, K)
+    shifts = shift_table(gran, weights, loss_patterns(K))
+    H_prev = None
+    for t in range(1,T+1):
+        size = gran*t+1
+        cells = ff.multiset_count(size, K-1)
+        print "\nCurrently generating samples for round {} ({} sorted cells instead of {}).".format(
+                t, cells, size**(K-1))
+        H_t = next_table(H_prev, t, gran, K, weights, shifts)
+        save_table(points_filename(args.out_dir, K, t, gran), H_t, gran, t, K)
+        if args.check and K == 3:
+            known = ff.cached_round(None, gran, t, ["known_points"])
+            if known is not None:
+                print "\nCells differing from known_points/: {}.".format(
+                        ff.compare_tables(expand_table(H_t, size, K), known))
+        H_prev = H_t
+    print "\nAll done. Tables are in {}.".format(args.out_dir)
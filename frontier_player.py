@@ -0,0 +1,114 @@
+'''
+Plays the minimax strategy for three experts online, with one table lookup per round, using the
+strategy tables that frontier.py --strategy saves next to the frontier tables.
+
+A player who wants to guarantee the regret vector <r0,r1,r2> (scaled by gran) over t rounds looks
+up the weight vector W[t][r0,r1], which realizes it. After the adversary's loss vector l, the regret
+to expert k grows by <l,p> - gran*l_k, and the target shrinks by as much (capped at gran*(t-1)).
+That is one of the seven points the realizability test checked (for the complementary loss pattern
+1-l, see frontier_functions.shift_table), so it is again realizable with t-1 rounds to go. So after
+all T rounds, the regret to every expert is at most the target we started from.
+
+Usage:
+
+python frontier_player.py <granularity> [-T rounds] [--out-dir dir] [--games n] [--seed s]
+
+plays n games (default 1000) against an adversary that picks loss vectors at random, from random
+starting points on the frontier H[T], and checks that every game stays within its target.
+'''
+
+import argparse
+import frontier_functions as ff
+import numpy as np
+import os
+import sys
+import time
+
+'''
+The player. Loads H[T] and the strategy tables W[1..T] for granularity gran from out_dir (run
+frontier.py with --strategy first). Call start() with a target, then weights() and update() once
+per round.
+'''
+class Player(object):
+
+    def __init__(self, gran, T, out_dir="."):
+        (self.gran, self.T) = (gran, T)
+        self.simplex = ff.weight_simplex(gran)
+        filename = ff.points_filename(out_dir, T, gran)
+        if not os.path.exists(filename):
+            filename = ff.points_filename(out_dir, T, gran, False)
+        self.H = ff.read_table(filename)
+        self.W = [None] + [ff.load_strategy(ff.strategy_filename(out_dir, t, gran))
+                           for t in range(1,T+1)]
+
+    '''
+    Starts a T-round game with the target regret <r0,r1,r2> in grid units (r2 defaults to the
+    frontier H[T][r0,r1]). Raises ValueError if the target is not realizable.
+    '''
+    def start(self, r0, r1, r2=None):
+        if r2 is None:
+            r2 = int(self.H[r0,r1])
+        if not ff.is_realizable(self.H[r0,r1]) or r2 < self.H[r0,r1]:
+            raise ValueError("<{},{},{}> is not realizable in {} rounds.".format(r0, r1, r2,
+                             self.T))
+        self.target = np.array([r0, r1, r2], dtype=np.int64)
+        self.state = self.target.copy()
+        self.regret = np.zeros(3, dtype=np.int64)
+        self.t = self.T
+
+    '''
+    The weight vector <p0,p1,p2> (summing to gran) to play this round, from one lookup.
+    '''
+    def weights(self):
+        m = self.W[self.t][self.state[0], self.state[1]]
+        if m < 0:
+            raise ValueError("No strategy for <{},{},{}> with {} rounds to go.".format(
+                             self.state[0], self.state[1], self.state[2], self.t))
+        return self.simplex[m]
+
+    '''
+    Moves on to the next round after the adversary played the 0/1 loss vector loss. Returns the
+    regret so far (in grid units), i.e., the player's loss minus each expert's.
+    '''
+    def update(self, loss):
+        loss = np.asarray(loss, dtype=np.int64)
+        regret = np.dot(loss, self.weights()) - self.gran*loss
+        self.regret += regret
+        self.t -= 1
+        self.state = np.minimum(self.state - regret, self.gran*self.t)
+        return self.regret
+
+
+########
+# MAIN #
+########
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play the minimax strategy from saved tables.")
+    parser.add_argument("gran", type=int, help="granularity")
+    parser.add_argument("-T", type=int, default=2, help="number of rounds (default 2)")
+    parser.add_argument("--out-dir", default=".", help="where frontier.py --strategy saved them")
+    parser.add_argument("--games", type=int, default=1000, help="games to play (default 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random adversary")
+    args = parser.parse_args()
+    if not os.path.exists(ff.strategy_filename(args.out_dir, args.T, args.gran)):
+        print "No strategy tables in {}, run frontier.py {} -T {} --strategy first.".format(
+                args.out_dir, args.gran, args.T)
+        sys.exit()
+
+    player = Player(args.gran, args.T, args.out_dir)
+    rng = np.random.RandomState(args.seed)
+    starts = np.transpose(np.nonzero(ff.is_realizable(player.H)))
+    patterns = np.array([[(k >> i) & 1 for i in range(3)] for k in range(8)])
+    (failures, lookups, start) = (0, 0, time.time())
+    for game in range(args.games):
+        (r0, r1) = starts[rng.randint(len(starts))]
+        player.start(r0, r1)
+        for t in range(args.T):
+            player.update(patterns[rng.randint(len(patterns))])
+            lookups += 1
+        if np.any(player.regret > player.target):
+            failures += 1
+            print "Game {} from {} ended with regret {}.".format(game, player.target, player.regret)
+    print "Played {} games of {} rounds, {:.1f} us per round. Games over their target: {}.".format(
+            args.games, args.T, 1e6*(time.time()-start)/max(1, lookups), failures)
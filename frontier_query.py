@@ -0,0 +1,142 @@
+'''
+Classifies regret vectors against any computed frontier table H[t], in batches. This generalizes
+pareto_functions.position_t1(), which only knows the T=1 frontier from its hand-derived planes.
+
+A point <r0,r1,r2> (in regret units, i.e., not scaled by gran) is "optimal" if it lies on the
+frontier, "suboptimal" if it is realizable but above it, and "impossible" otherwise, with the same
+IMPOSSIBLE/OPTIMAL/SUBOPTIMAL codes as pareto_functions.position_t1_batch().
+
+The table only knows the frontier at multiples of 1/gran, so r0 and r1 get snapped to the grid:
+to the nearest grid point (the default), or down or up. Since the table is nonincreasing, snapping
+down gives an upper bound on the frontier there (so "optimal" or "suboptimal" then really means
+realizable, at this granularity), and snapping up a lower bound. Then r2 is compared against the
+frontier value with a tolerance (default 1e-5, as in position_t1). Regrets of at least t are the
+same as t for the table, so r0 and r1 are capped at t.
+
+Usage:
+
+python frontier_query.py <table> <points> [--gran g] [--snap nearest|down|up] [--tolerance e]
+                         [--out file]
+
+where table is a saved table (binary, or text named points_<t>_<gran>) and points is a text file
+with one "r0 r1 r2" point per line (lines starting with # are skipped, so the output of pareto.py
+works). Prints how many points are in each class, and with --out writes one code per line.
+'''
+
+import argparse
+import frontier_functions as ff
+import numpy as np
+import os
+import pareto_functions as par
+import sys
+
+'''
+A lookup index for one table H[t] at granularity gran: the frontier as a flat float array (in grid
+units, inf where unrealizable), so classifying a point is one snap and one array lookup.
+'''
+class FrontierIndex(object):
+
+    def __init__(self, H, gran, t=None):
+        size = H.shape[0]
+        if t is None:
+            t = (size-1) // gran
+        if H.shape != (gran*t+1, gran*t+1):
+            raise ValueError("A table for t = {} at granularity {} must be {} x {}.".format(t, gran,
+                             gran*t+1, gran*t+1))
+        (self.gran, self.t, self.size) = (gran, t, size)
+        self.frontier = np.where(ff.is_realizable(H), H, np.inf).astype(np.float64).ravel()
+
+    '''
+    Snaps (r0,r1) in regret units to grid indices, capped to the table.
+    '''
+    def snap(self, r0, r1, snap="nearest"):
+        rounding = {"nearest": np.rint, "down": np.floor, "up": np.ceil}[snap]
+        i = np.clip(rounding(np.asarray(r0, dtype=np.float64) * self.gran), 0, self.size-1)
+        j = np.clip(rounding(np.asarray(r1, dtype=np.float64) * self.gran), 0, self.size-1)
+        return (i.astype(np.int64), j.astype(np.int64))
+
+    '''
+    The smallest r2 (in regret units) that is realizable at the grid point that (r0,r1) snaps to,
+    or inf where none is.
+    '''
+    def frontier_value(self, r0, r1, snap="nearest"):
+        (i,j) = self.snap(r0, r1, snap)
+        return self.frontier[i*self.size + j] / self.gran
+
+    '''
+    Classifies an array of points whose last axis has length 3 (e.g., (N,3)), returning an integer
+    array of the same shape without that axis. Works through chunk points at a time, so that the
+    temporaries stay small for millions of points.
+    '''
+    def classify(self, points, snap="nearest", tolerance=1e-5, chunk=1 << 20):
+        points = np.asarray(points, dtype=np.float64)
+        flat = points.reshape(-1, 3)
+        codes = np.empty(len(flat), dtype=np.int8)
+        for start in range(0, len(flat), chunk):
+            (r0,r1,r2) = flat[start:start+chunk].T
+            # Everything in grid units from here on.
+            z = self.frontier_value(r0, r1, snap) * self.gran
+            d = r2 * self.gran - z
+            tol = tolerance * self.gran
+            negative = (r0 < 0) | (r1 < 0) | (r2 < 0)
+            codes[start:start+chunk] = np.select(
+                    [negative | np.isinf(z) | (d < -tol), d > tol],
+                    [par.IMPOSSIBLE, par.SUBOPTIMAL], par.OPTIMAL)
+        return codes.reshape(points.shape[:-1])
+
+'''
+Builds the index for a saved table, binary or text. The granularity and horizon come from the
+binary header, or from the name points_<t>_<gran> of a text file (or pass gran).
+'''
+def load_index(filename, gran=None):
+    info = ff.binary_info(filename)
+    if info is not None:
+        return FrontierIndex(ff.read_table(filename), info["gran"], info["t"])
+    H = ff.read_table(filename)
+    if gran is None:
+        fields = os.path.basename(filename).split("_")
+        if len(fields) != 3 or fields[0] != "points":
+            raise ValueError("Can't tell the granularity of " + filename + ", pass it in.")
+        gran = int(fields[2])
+    return FrontierIndex(H, gran)
+
+'''
+Builds the index for round t at granularity gran from the cache or known_points/ (see
+frontier_functions.cached_round()), or returns None if we don't have that table.
+'''
+def cached_index(gran, t, cache_dir="cache", known_dirs=("known_points",)):
+    H = ff.cached_round(cache_dir, gran, t, known_dirs)
+    if H is None:
+        return None
+    return FrontierIndex(H, gran, t)
+
+
+########
+# MAIN #
+########
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify points against a frontier table.")
+    parser.add_argument("table", help="saved table, binary or text")
+    parser.add_argument("points", help="text file with one 'r0 r1 r2' point per line")
+    parser.add_argument("--gran", type=int, help="granularity of a text table not named "
+                                                 "points_<t>_<gran>")
+    parser.add_argument("--snap", choices=["nearest", "down", "up"], default="nearest",
+                        help="how r0 and r1 are snapped to the grid (default nearest)")
+    parser.add_argument("--tolerance", type=float, default=1e-5,
+                        help="how far from the frontier r2 still counts as optimal (default 1e-5)")
+    parser.add_argument("--out", help="write one code per line (0 impossible, 1 optimal, "
+                                      "2 suboptimal)")
+    args = parser.parse_args()
+    if not os.path.exists(args.table) or not os.path.exists(args.points):
+        print "Can't find " + (args.points if os.path.exists(args.table) else args.table) + "."
+        sys.exit()
+
+    index = load_index(args.table, args.gran)
+    codes = index.classify(np.loadtxt(args.points, ndmin=2), args.snap, args.tolerance)
+    print "Classified {} points against H[{}] at granularity {}.".format(len(codes), index.t,
+            index.gran)
+    for code in (par.OPTIMAL, par.SUBOPTIMAL, par.IMPOSSIBLE):
+        print "{}: {}".format(par.POSITION_NAMES[code], np.sum(codes == code))
+    if args.out is not None:
+        np.savetxt(args.out, codes, fmt='%d')
@@ -0,0 +1,158 @@
+'''
+The exact regret tradeoff profile for two experts, from Theorem 6: the Pareto frontier of a T-round
+game is the piecewise linear curve through the vertices <f_T(i), f_T(T-i)> for i = 0,1,...,T, with
+
+f_T(i) = sum_{j=1}^{i} j * 2^(j-T) * (T-j-1 choose T-i-1).
+
+pareto_functions.fT_formula() evaluates that sum as written, which costs O(i) binomials (each from
+three factorials) per vertex. Here all the vertices of one T come out of a single pass instead. With
+n = T-1 and U(a) = sum_{b>a} (n choose b), summing the binomials in the formula by parts gives
+
+2^n * f_T(i) = i * U(n-i) - (T-i) * U(n-i+1),
+
+so going from i to i+1 only adds one binomial to U, and each binomial is the previous one times a
+ratio. That is O(T) operations on integers of about T bits, and the numerators are exact (their
+common denominator is 2^(T-1)), so T in the tens of thousands takes seconds.
+
+Usage:
+
+python frontier_two.py <rounds> [--float] [--out file] [--table file] [--check]
+
+prints how long the vertices took. With --out, writes one "f_T(i) f_T(T-i)" vertex per line, as
+exact fractions or, with --float, as floats. With --table, compares a discretized two-expert table
+(frontier_k.py 2 <gran> -T <rounds> writes points_k2_<t>_<gran>.bin) against the exact frontier.
+With --check, compares every vertex against pareto_functions.fT_formula() (slow for large T).
+'''
+
+import argparse
+import fractions
+import frontier_functions as ff
+import numpy as np
+import operator
+import os
+import pareto_functions as par
+import sys
+import time
+
+'''
+Yields the exact numerators 2^(T-1) * f_T(i) for i = 0,1,...,T, as integers, keeping only a couple
+of them (and one binomial) alive at a time. See the top of this file for the recurrence.
+'''
+def vertex_numerators(T):
+    n = T-1
+    (binomial, upper, lower) = (1, 0, 0)   # (n choose a), U(a) and U(a+1), for a = n-i.
+    for i in range(T+1):
+        yield i*upper - (T-i)*lower
+        a = n-i
+        (upper, lower) = (upper + binomial, upper)
+        if a > 0:
+            binomial = binomial * a // (n-a+1)
+
+'''
+Yields f_T(0), ..., f_T(T) as exact fractions (p,q) in lowest terms. The denominators are powers of
+two, so this only strips the common trailing zero bits, where a Fraction would run Euclid's
+algorithm on T-bit integers (which takes minutes for T in the tens of thousands).
+'''
+def dyadic_values(T):
+    if T < 1:
+        raise ValueError("Theorem 6 needs T >= 1, got T = " + str(T))
+    for num in vertex_numerators(T):
+        if num == 0:
+            yield (0, 1)
+            continue
+        shift = min(T-1, (num & -num).bit_length() - 1)
+        yield (num >> shift, 1 << (T-1-shift))
+
+'''
+All of f_T(0), ..., f_T(T). With exact=True, as a list of Fractions (see dyadic_values() for large
+T). Otherwise as a numpy float array, where each value is the correctly rounded quotient of its
+exact numerator (so nothing overflows for large T).
+'''
+def fT_all(T, exact=True):
+    if T < 1:
+        raise ValueError("Theorem 6 needs T >= 1, got T = " + str(T))
+    if exact:
+        return [fractions.Fraction(p, q) for (p,q) in dyadic_values(T)]
+    denominator = 2**(T-1)
+    return np.array([operator.truediv(num, denominator) for num in vertex_numerators(T)])
+
+'''
+The vertices <f_T(i), f_T(T-i)> of the T-round frontier, going from <0,T> to <T,0>. With exact=True,
+as a list of pairs of Fractions, and otherwise as a (T+1,2) float array.
+'''
+def vertices(T, exact=True):
+    values = fT_all(T, exact)
+    if exact:
+        return zip(values, values[::-1])
+    return np.column_stack([values, values[::-1]])
+
+'''
+The frontier itself: the smallest regret r1 to the second expert that is realizable in T rounds
+together with regret r0 to the first one. Takes and returns floats (or float arrays), and is 0 for
+r0 >= T. Pass the float vertices if they are already around.
+'''
+def frontier_value(T, r0, points=None):
+    if points is None:
+        points = vertices(T, exact=False)
+    return np.interp(r0, points[:,0], points[:,1])
+
+'''
+Compares a discretized two-expert table (from frontier_k.py with 2 experts, so H[t][r0] is the
+smallest realizable r1 in grid units) against the exact frontier of the same horizon. Returns the
+largest amount (in regret units) by which the table is above and below the exact frontier, over the
+realizable cells. The table can only be above it, up to the rounding of r1 to the grid.
+'''
+def compare_table(H, gran, t, points=None):
+    H = np.asarray(H)
+    r0 = np.arange(len(H)) / float(gran)
+    realizable = ff.is_realizable(H)
+    diff = H[realizable] / float(gran) - frontier_value(t, r0[realizable], points)
+    return (max(0.0, diff.max()), max(0.0, -diff.min()))
+
+
+########
+# MAIN #
+########
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute the exact two-expert frontier.")
+    parser.add_argument("T", type=int, help="number of rounds")
+    parser.add_argument("--float", action="store_true", help="floats instead of exact fractions")
+    parser.add_argument("--out", help="write one 'f_T(i) f_T(T-i)' vertex per line")
+    parser.add_argument("--table", help="compare a points_k2_<t>_<gran>.bin from frontier_k.py")
+    parser.add_argument("--check", action="store_true", help="compare against fT_formula()")
+    args = parser.parse_args()
+    if args.T < 1:
+        print "Can't compute the frontier for T = {}.".format(args.T)
+        sys.exit()
+
+    start = time.time()
+    if args.float:
+        values = fT_all(args.T, exact=False)
+    else:
+        values = list(dyadic_values(args.T))
+    print "Computed the {} vertices for T = {} in {:.3f}s.".format(args.T+1, args.T,
+            time.time()-start)
+    if args.out is not None:
+        if not args.float:
+            values = ["{}/{}".format(p, q) if q > 1 else str(p) for (p,q) in values]
+        with open(args.out, "w") as f:
+            for (x,y) in zip(values, values[::-1]):
+                f.write("{} {}\n".format(x, y))
+    if args.check:
+        values = fT_all(args.T, exact=False)
+        worst = max(abs(values[i] - par.fT_formula(i, args.T)) for i in range(args.T+1))
+        print "Largest difference from fT_formula(): {}.".format(worst)
+    if args.table is not None:
+        if not os.path.exists(args.table):
+            print "Can't find " + args.table + "."
+            sys.exit()
+        info = ff.binary_info(args.table)
+        if info is None or info["experts"] != 2:
+            print args.table + " is not a two-expert table from frontier_k.py."
+            sys.exit()
+        if info["t"] != args.T:
+            print "Note: {} is for T = {}, comparing against that.".format(args.table, info["t"])
+        (above, below) = compare_table(ff.load_binary(args.table)[1], info["gran"], info["t"])
+        print "The table is up to {:.6f} above and {:.6f} below the exact frontier.".format(above,
+                below)
@@ -5,12 +5,22 @@ Update: I'm now using this code to plot the 3-D frontier with one expert.
 (c) March 2015 by Daniel Seita
 '''
 
-from mpl_toolkits.mplot3d import Axes3D
-import matplotlib.pyplot as plt
+import argparse
+import itertools
+import multiprocessing
 import numpy as np
 import pareto_functions as par
 import sys
 
+'''
+Imports matplotlib (and its 3-D toolkit, which registers the '3d' projection) only once we actually
+plot, so that the searches can be imported and run on machines without a display.
+'''
+def pyplot():
+    from mpl_toolkits.mplot3d import Axes3D
+    import matplotlib.pyplot as plt
+    return plt
+
 '''
 Computes the first plane for G_{T=1} which is the one where x+y+z=2. A plane is a*x+b*y+c*z+d=0,
 [a,b,c] is the normal. Thus, we calculate d and we're set. We create a mesh grid and calculate the
@@ -59,6 +69,7 @@ def position_t0(points_list):
 We'll manually put in some points to make plotting easier
 '''
 def simple_plot_tests():
+    plt = pyplot()
     optimal = [np.array([2,.5,.5]),np.array([.5,2,.5]),np.array([.5,.5,2]), 
                np.array([2,2,0]),np.array([2,0,2]),np.array([0,2,2]),
                (1./99)*np.array([82,66,116]), 
@@ -80,6 +91,7 @@ def simple_plot_tests():
 Plot the G_{T=1} frontier by going through each of the planes and getting their meshgrids and z's
 '''
 def plot_3d_frontier():
+    plt = pyplot()
     plt3d = plt.figure().gca(projection='3d')
     a,b,c = plane_one()
     plt3d.plot_trisurf(a,b,c)
@@ -120,6 +132,7 @@ def brute_force_t1():
     print "Number of impossible, suboptimal, and optimal points: {0}, {1}, {2}.".format(
         len(impossible),len(suboptimal),len(optimal))
     # Next step is to plot. There are several ways we can do this.
+    plt = pyplot()
     plt3d = plt.figure().gca(projection='3d')
     x_coordinates = [point[0] for point in impossible]
     y_coordinates = [point[1] for point in impossible]
@@ -131,104 +144,121 @@ def brute_force_t1():
 
 
 '''
-Given a list of 3-D points, we will augment the list by adding in all points that can be formed by
-usin the same components. For instance, a list of:
-
-[np.array([1,2,3]), np.array([1,1,1])]
-
-Turns into:
-
-[np.array([1,2,3]), np.array([2,1,3]), np.array([1,3,2]), np.array([3,2,1]), np.array([3,1,2]),
-np.array([2,3,1]), np.array([1,1,1])]
+The rationals are shared with the worker processes once, when the pool starts, instead of with
+every chunk.
+'''
+def _init_t2_worker(rationals):
+    global _t2_rationals
+    _t2_rationals = rationals
 
-This should be fine because if np.array([a,b,c]) is a valid point, then there exists a probability
-vector. Now if the order of a,b,c, gets changed, we just change the probability vector accordingly.
+'''
+Classifies one chunk of ordered triples (c0,c1,c2) of rationals for \mathbb{G}_{T=2}. A chunk is
+(first, lo, hi): c0 is rationals[first], c1 runs over rationals[lo:hi] and c2 over rationals[c1:].
+Does exactly what the triple loop did for each point, but with the batch functions of
+pareto_functions.py. Returns the number of triples in the chunk, the number of points tested (those
+with a coordinate sum of at least 2), and the optimal points as an (N,3) array.
+'''
+def _classify_t2_chunk(chunk):
+    (first, lo, hi) = chunk
+    rationals = _t2_rationals
+    n = len(rationals)
+    second = np.concatenate([np.repeat(j, n-j) for j in range(lo, hi)])
+    third = np.concatenate([np.arange(j, n) for j in range(lo, hi)])
+    c = np.empty((len(second), 3))
+    (c[:,0],c[:,1],c[:,2]) = (rationals[first], rationals[second], rationals[third])
+    (basis0,basis1,basis2) = (np.array([0,2,2]), np.array([2,0,2]), np.array([2,2,0]))
+    p = c[:,0:1]*basis0 + c[:,1:2]*basis1 + c[:,2:3]*basis2
+    keep = np.sum(p, axis=1) >= 2
+    (p,c) = (p[keep],c[keep])
+    w = c / np.sum(c, axis=1)[:,np.newaxis]
+    codes = par.position_t1_batch(par.get_six_points_batch(p, w))
+    impossible = np.any(codes == par.IMPOSSIBLE, axis=1)
+    optimal = ~impossible & np.any(codes == par.OPTIMAL, axis=1)
+    return (len(keep), len(p), p[optimal])
 
-Input: coordinates is a numpy array.
 '''
-def replicate(coordinates):
-    result = [coordinates]
-    r1,r2,r3 = coordinates[0],coordinates[1],coordinates[2]
-    p2 = np.array([r1,r3,r2])
-    if not any((p2 == x).all() for x in result):
-        result.append(p2)
-    p3 = np.array([r2,r1,r3])
-    if not any((p3 == x).all() for x in result):
-        result.append(p3)
-    p4 = np.array([r2,r3,r1])
-    if not any((p4 == x).all() for x in result):
-        result.append(p4)
-    p5 = np.array([r3,r1,r2])
-    if not any((p5 == x).all() for x in result):
-        result.append(p5)
-    p6 = np.array([r3,r2,r1])
-    if not any((p6 == x).all() for x in result):
-        result.append(p6)
-    return result
+Splits the triples first <= second <= third of n rationals into chunks of roughly chunk_size
+triples (but never less than one value of second), in the order of the old triple loop. A chunk is
+only three integers, so it does not matter that the pool reads all of them ahead of time.
+'''
+def t2_chunks(n, chunk_size):
+    for first in range(n):
+        lo = first
+        while lo < n:
+            (hi,count) = (lo,0)
+            while hi < n and (count == 0 or count + (n-hi) <= chunk_size):
+                count += n-hi
+                hi += 1
+            yield (first, lo, hi)
+            lo = hi
 
+'''
+Streams the brute-force search for \mathbb{G}_{T=2} with rationals of denominator at most
+den_limit. Yields (triples_done, total_triples, points_tested, optimal) after each chunk, where
+optimal holds the chunk's optimal points with c0 <= c1 <= c2, in the order of the old triple loop.
+With workers > 1, the chunks are classified in a process pool.
+'''
+def stream_brute_force_t2(den_limit, workers=1, chunk_size=200000):
+    rationals = np.array(par.generate_rationals(den_limit, 1))
+    n = len(rationals)
+    print "There are a total of " + str(n) + " possible values for a single basis... "
+    total = n*(n+1)*(n+2)//6
+    (done,tested) = (0,0)
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, _init_t2_worker, (rationals,))
+        results = pool.imap(_classify_t2_chunk, t2_chunks(n, chunk_size))
+    else:
+        pool = None
+        _init_t2_worker(rationals)
+        results = itertools.imap(_classify_t2_chunk, t2_chunks(n, chunk_size))
+    try:
+        for (triples, points, optimal) in results:
+            done += triples
+            tested += points
+            yield (done, total, tested, optimal)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
 
-########
-# MAIN #
-########
 
-# To make it simple, we manually choose which task we want to do here.
-brute_force_t2 = True
-simple_plot_tests = False
-brute_force_t1 = False
-plot_3d_frontier = False
-if simple_plot_tests:
-    simple_plot_tests()
-if plot_3d_frontier:
-    plot_3d_frontier()
-if brute_force_t1:
-    brute_force_t1()
-
-# Attempts to find \mathbb{G}_{T=2} by brute-force simulation.
-# Note: "optimal" starts with three known corner cases that this simulation will not capture
-# Also, we only need c0 <= c1 <= c2 because the others can be found by swapping the components
-if brute_force_t2:
+'''
+Finds \mathbb{G}_{T=2} by brute-force simulation, with stream_brute_force_t2(). Returns the optimal
+points as a pareto_functions.PointSet, which starts with the known corner cases that the simulation
+will not capture. If out is a filename, each new point (up to permutation) is also written there as
+an "r0 r1 r2" line as soon as it is found. This never imports matplotlib.
+'''
+def brute_force_t2(den_limit=30, workers=1, chunk_size=200000, out=None):
     print "Now attempting to find \mathbb{G}_{T=2} by brute-force simulation..."
-    impossible,suboptimal = [],[]
-    optimal = [np.array([2,.5,.5]),np.array([.5,2,.5]),np.array([.5,.5,2]),
+    corners = [np.array([2,.5,.5]),np.array([.5,2,.5]),np.array([.5,.5,2]),
                np.array([0,2,2]),np.array([2,0,2]),np.array([2,2,0]),
                np.array([1.5,1.5,1./3]),np.array([1./3,1.5,1.5]),np.array([1.5,1./3,1.5])]
-    (basis0,basis1,basis2) = (np.array([0,2,2]), np.array([2,0,2]), np.array([2,2,0]))
-    rationals = par.generate_rationals(30, 1)
-    print "There are a total of " + str(len(rationals)) + " possible values for a single basis... "
-    points_tested = 0
-    for first in range(0, len(rationals)):
-        for second in range(first, len(rationals)):
-            for third in range(second, len(rationals)):
-                (c0,c1,c2) = (rationals[first],rationals[second],rationals[third])
-                p = c0*basis0 + c1*basis1 + c2*basis2
-                if np.sum(p) < 2:
-                    continue
-                w = np.array([c0, c1, c2])
-                w = w / np.sum(w)
-                six_points = par.get_six_points(p, w, False)
-                points_tested += 1
-                if points_tested % 250000 == 0:
-                    print "Points tested: {}.".format(points_tested)
-                done = False
-                for s in six_points:
-                    if par.position_t1(s) == "Impossible":
-                        done = True
-                        break
-                if not done:
-                    for s in six_points:
-                        if par.position_t1(s) == "Optimal":
-                            symmetrical_points = replicate(p)
-                            for pt in symmetrical_points:
-                                optimal.append(pt)
-                            done = True
-                            break
-    print "Number of optimal points: {}.".format(len(optimal))
-    print "Total points tested: {}".format(points_tested)
-    f = open('known_points', 'w')
-    for item in optimal:
-        f.write(str(item) + '\n')
-    f.close()
-    # Next step is to plot. There are several ways we can do this.
+    optimal = par.PointSet()
+    f = open(out, 'w') if out is not None else None
+    if f is not None:
+        f.write("# Optimal points with r0 <= r1 <= r2. All their permutations are optimal too.\n")
+    for (done, total, tested, points) in itertools.chain([(0, 1, 0, np.array(corners))],
+            stream_brute_force_t2(den_limit, workers, chunk_size)):
+        new = optimal.add_batch(points)
+        if f is not None:
+            for item in new:
+                f.write("{!r} {!r} {!r}\n".format(*item))
+            f.flush()
+        print "\rTriples: {0:.2f} %, points tested: {1}, optimal up to permutation: {2}.".format(
+                100*float(done)/total, tested, len(optimal)),
+        sys.stdout.flush()
+    if f is not None:
+        f.close()
+    print "\nNumber of optimal points: {}.".format(len(optimal.expanded()))
+    print "Total points tested: {}".format(tested)
+    return optimal
+
+'''
+Plots the given optimal points of \mathbb{G}_{T=2} (an (N,3) array) in black, over the
+\mathbb{G}_{T=1} frontier in yellow.
+'''
+def plot_t2(optimal):
+    plt = pyplot()
     plt3d = plt.figure().gca(projection='3d')
 
     a,b,c = plane_one()
@@ -238,14 +268,50 @@ if brute_force_t2:
     plt3d.plot_surface(b,a,c,color='y')
     plt3d.plot_surface(c,b,a,color='y')
 
-    x_coordinates = [point[0] for point in optimal]
-    y_coordinates = [point[1] for point in optimal]
-    z_coordinates = [point[2] for point in optimal]
-    plt3d.scatter(x_coordinates, y_coordinates, z_coordinates, c='k')
+    plt3d.scatter(optimal[:,0], optimal[:,1], optimal[:,2], c='k')
     #plt3d.plot_trisurf(x_coordinates, y_coordinates, z_coordinates)
     plt.xlabel('X axis')
     plt.ylabel('Y axis')
     plt.show()
 
 
+########
+# MAIN #
+########
+
+# To make it simple, we manually choose which task we want to do here.
+if __name__ == "__main__":
+    run_brute_force_t2 = True
+    run_simple_plot_tests = False
+    run_brute_force_t1 = False
+    run_plot_3d_frontier = False
+    if run_simple_plot_tests:
+        simple_plot_tests()
+    if run_plot_3d_frontier:
+        plot_3d_frontier()
+    if run_brute_force_t1:
+        brute_force_t1()
 
+    # Attempts to find \mathbb{G}_{T=2} by brute-force simulation.
+    # We only need c0 <= c1 <= c2 because the others can be found by swapping the components.
+    # Optimal points are written to the output file as they are found, one "r0 r1 r2" line for each
+    # point up to permutation (see pareto_functions.PointSet). The triples are streamed in chunks,
+    # but the PointSet that removes duplicates keeps every distinct optimal point, so memory grows
+    # with the number of those. Use pareto_functions.expand_permutations() on the file to get all
+    # of them.
+    if run_brute_force_t2:
+        parser = argparse.ArgumentParser(description="Find G_{T=2} by brute-force simulation.")
+        parser.add_argument("--den-limit", type=int, default=30,
+                            help="largest denominator of the rationals (default 30)")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="number of processes (default 1)")
+        parser.add_argument("--chunk-size", type=int, default=200000,
+                            help="triples classified per chunk (default 200000)")
+        parser.add_argument("--out", default="known_points_t2",
+                            help="file the optimal points are written to (default known_points_t2)")
+        parser.add_argument("--headless", action="store_true",
+                            help="don't plot, so matplotlib is never imported")
+        args = parser.parse_args()
+        optimal = brute_force_t2(args.den_limit, args.workers, args.chunk_size, args.out)
+        if not args.headless:
+            plot_t2(optimal.expanded())
@@ -6,21 +6,25 @@ should be considered as NUMPY arrays/matrices.
 (c) March 2015 by Daniel Seita
 '''
 
+import itertools
 import numpy as np
+import operator
 
 '''
-A simple factorial function. Yes, I know that "raise Exception(...)" is bad practice...
+A simple factorial function. Yes, I know that "raise Exception(...)" is bad practice... It's a loop
+rather than a recursion, so it works past the recursion limit (around n = 1000).
 '''
 def factorial(n):
     if n < 0:
         raise Exception("Invalid input for factorial, n = " + str(n))
-    elif n == 0 or n == 1:
-        return 1
-    else:
-        return n * factorial(n-1)
+    result = 1
+    for k in range(2, n+1):
+        result *= k
+    return result
 
 '''
 An n-choose-k that also deals with a special case where we have (n choose -1)s from Theorem 6.
+Multiplies min(k,n-k) ratios instead of dividing three factorials.
 '''
 def nchoosek(n, k):
     if k == -1:
@@ -28,17 +32,23 @@ def nchoosek(n, k):
             return 1
         else:
             return 0
-    else:
-        return factorial(n) / (factorial(n-k) * factorial(k))
+    if n < 0 or k < 0 or k > n:
+        raise Exception("Invalid input for nchoosek, n = " + str(n) + ", k = " + str(k))
+    result = 1
+    for j in range(min(k, n-k)):
+        result = result * (n-j) // (j+1)
+    return result
 
 '''
-The f_T(i) formula Wouter presented in Theorem 6. Here, i is the vertex index.
+The f_T(i) formula Wouter presented in Theorem 6. Here, i is the vertex index. This evaluates the
+sum as written, so to get all the vertices of one T, use frontier_two.fT_all() instead. The sum is
+kept in integers (times 2^T), so large binomials don't overflow a float.
 '''
 def fT_formula(i, T):
     sum = 0
     for j in range(1,i+1):
-        sum += (j * (2**(j-T)) * nchoosek(T-j-1,T-i-1))
-    return sum
+        sum += (j * (2**j) * nchoosek(T-j-1,T-i-1))
+    return operator.truediv(sum, 2**T)
 
 '''
 Given two or three points, returns their convex combination. The third point is optional. The points
@@ -50,20 +60,23 @@ def convex_combo(point1, point2, point3=None):
     else:
         return (1.0/3) * (point1 + point2 + point3)
 
+'''
+Integer codes for the position of a point relative to a frontier, as returned by the batch functions
+below, and the strings that the single-point functions return for each of them.
+'''
+IMPOSSIBLE = 0
+OPTIMAL = 1
+SUBOPTIMAL = 2
+POSITION_NAMES = ["Impossible", "Optimal", "Suboptimal"]
+
 '''
 Given a 3-D point (r_0,r_1,r_2), and a probability weight vector (p_0,p_1,p_2), determine the six
 vectors the adversary could play to make the point "closer" to the origin. The third argument can be
 set False if one wishes to suppress the default printing.
 '''
 def get_six_points(point, weights, print_info=True):
-    (r0,r1,r2) = (point[0],point[1],point[2])
-    (p1,p2) = (weights[1],weights[2])
-    point1 = np.array([ r0 - (p1+p2), r1 - ((p1-1)+p2), r2 - (p1+(p2-1)) ])
-    point2 = np.array([ r0 - (-p1),   r1 - (-(p1-1)),   r2 - (-p1) ])
-    point3 = np.array([ r0 - (-p2),   r1 - (-p2),       r2 - (-(p2-1)) ])
-    point4 = np.array([ r0 + (p1+p2), r1 + ((p1-1)+p2), r2 + (p1+(p2-1)) ])
-    point5 = np.array([ r0 + (-p1),   r1 + (-(p1-1)),   r2 + (-p1) ])
-    point6 = np.array([ r0 + (-p2),   r1 + (-p2),       r2 + (-(p2-1)) ])
+    six_points = get_six_points_batch(np.asarray(point)[np.newaxis], np.asarray(weights))[0]
+    (point1,point2,point3,point4,point5,point6) = six_points
     if print_info:
         print ""
         print "Using loss vector <0,1,1>, we get " + str(point1) 
@@ -75,6 +88,25 @@ def get_six_points(point, weights, print_info=True):
         print ""
     return [point1,point2,point3,point4,point5,point6]
 
+'''
+The batch version of get_six_points(). Takes an (N,3) array of points and an (N,3) array of weight
+vectors (or a single weight vector for all of them) and returns an (N,6,3) array, where [:,i,:] is
+the point we get using the i-th loss vector, in the same order as above. With d1 = <p1,p1-1,p1> and
+d2 = <p2,p2,p2-1>, the six offsets are -(d1+d2), +d1, +d2, +(d1+d2), -d1 and -d2.
+'''
+def get_six_points_batch(points, weights):
+    points = np.asarray(points)
+    weights = np.asarray(weights)
+    (p1,p2) = (weights[...,1], weights[...,2])
+    d1 = np.stack([p1, p1-1, p1], axis=-1)
+    d2 = np.stack([p2, p2, p2-1], axis=-1)
+    d12 = np.stack([p1+p2, (p1-1)+p2, p1+(p2-1)], axis=-1)
+    d1 = np.broadcast_to(d1, points.shape)
+    d2 = np.broadcast_to(d2, points.shape)
+    d12 = np.broadcast_to(d12, points.shape)
+    offsets = [-d12, d1, d2, d12, -d1, -d2]
+    return np.stack([points + offset for offset in offsets], axis=1)
+
 '''
 Given a 3-D point (r_0,r_1,r_2), tests to see this position relative to the \mathbb{G}_{T=1}
 frontier. Possible return values are (1) on it (i.e., an optimal point with respect to the player),
@@ -83,43 +115,32 @@ explicit, we return the following three strings: "optimal", "impossible", or "su
 
 NOTE I am testing an epsilon here of around 1e-6 in case rounding errors occur.
 
-NOTE This is for a single point. Do not input a list of points.
+NOTE This is for a single point. Use position_t1_batch() for many points at once.
 '''
 def position_t1(point):
+    return POSITION_NAMES[position_t1_batch(np.asarray(point)[np.newaxis])[0]]
+
+'''
+The batch version of position_t1(). Takes an array of points whose last axis has length 3 (e.g.,
+(N,3), or the (N,6,3) output of get_six_points_batch()) and returns an integer array of the same
+shape without that axis, holding IMPOSSIBLE, OPTIMAL or SUBOPTIMAL. The cases are tested in the same
+order and with the same epsilon as a single point would be.
+'''
+def position_t1_batch(points):
     epsilon = 1e-5
-    (r0,r1,r2) = (point[0],point[1],point[2])
-    if r0 < 0 or r1 < 0 or r2 < 0:
-        return "Impossible" # An easy case
-    if r0 > 2./3 and r1 > 2./3 and r2 > 2./3:
-        return "Suboptimal" # A bit redundant but I guess it doesn't hurt
-    if r0 <= 1 and r1 <= 1 and r2 <= 1:
-        # This case we are contained in the cube that contains the triangular plane at x+y+z=2.
-        summ = r0 + r1 + r2
-        if (summ > (2 - epsilon)) and (summ < (2 + epsilon)):
-        #if summ == 2:
-            return "Optimal"
-        elif summ > 2:
-            return "Suboptimal"
-        else:
-            return "Impossible"
-    else:
-        # Now we could be in any of the three other blocks. They are symmetric.
-        if r0 >= 1:
-            # Case of plane y + z = 1
-            summ = r1 + r2
-        elif r1 >= 1:
-            # Case of plane x + z = 1
-            summ = r0 + r2
-        else:
-            # Case of plane x + y = 1
-            summ = r0 + r1
-        if (summ > (1 - epsilon)) and (summ < (1 + epsilon)):
-        #if summ == 1:
-            return "Optimal"
-        elif summ > 1:
-            return "Suboptimal"
-        else:
-            return "Impossible"
+    points = np.asarray(points)
+    (r0,r1,r2) = (points[...,0],points[...,1],points[...,2])
+    negative = (r0 < 0) | (r1 < 0) | (r2 < 0)
+    above = (r0 > 2./3) & (r1 > 2./3) & (r2 > 2./3)
+    in_cube = (r0 <= 1) & (r1 <= 1) & (r2 <= 1)
+    # In the cube that contains the triangular plane at x+y+z=2, we compare x+y+z against 2.
+    # Otherwise we are in one of the three other (symmetric) blocks: y+z=1, x+z=1 or x+y=1.
+    summ = np.where(in_cube, r0 + r1 + r2,
+                    np.where(r0 >= 1, r1 + r2, np.where(r1 >= 1, r0 + r2, r0 + r1)))
+    target = np.where(in_cube, 2, 1)
+    on_plane = (summ > (target - epsilon)) & (summ < (target + epsilon))
+    return np.select([negative, above, on_plane, summ > target],
+                     [IMPOSSIBLE, SUBOPTIMAL, OPTIMAL, SUBOPTIMAL], IMPOSSIBLE)
 
 '''
 Given a denominator limit d, generate a list of rationals p/q such that 1 <= q <= d AND that 0 <=
@@ -133,17 +154,131 @@ But because we test for inclusion, our actual list would be:
 
 [0, 1, 1/2, 1/3, 2/3]
 
-Also to make things faster we should just include 0 at the start, that way we don't need to test it.
+The inclusion test is now exact: a fraction is new if and only if it is reduced, i.e., gcd(p,q) = 1
+(see rational_pairs). This used to check "value not in result" against the list, which is quadratic
+and compares floats. The values (and their order) are the same as before.
 '''
 def generate_rationals(den_limit, actual_limit):
-    result = [0]
-    for denominator in range(1, den_limit+1):
-        for numerator in range(1, denominator*actual_limit + 1):
-            value = float(numerator) / denominator
-            if value not in result:
-                result.append(value)
-    return result
+    pairs = rational_pairs(den_limit, actual_limit)
+    return [0] + (pairs[1:,0] / pairs[1:,1].astype(float)).tolist()
+
+'''
+All reduced fractions p/q with 1 <= q <= den_limit and 0 <= p/q <= actual_limit (an integer), as an
+(N,2) integer array of (p,q) rows, ordered by denominator and then numerator, starting with 0/1.
+Builds every p/q with p >= 1 at once and keeps those with gcd(p,q) = 1, so den_limit in the
+thousands takes milliseconds.
+'''
+def rational_pairs(den_limit, actual_limit):
+    counts = actual_limit * np.arange(1, den_limit+1)
+    q = np.repeat(np.arange(1, den_limit+1), counts)
+    p = np.arange(len(q)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    reduced = np.gcd(p, q) == 1
+    return np.concatenate([[[0,1]], np.column_stack([p[reduced], q[reduced]])])
+
+'''
+The same rationals as generate_rationals, but as a sorted numpy array: the Farey sequence of order
+den_limit, stretched over [0, actual_limit]. With exact=True, returns the (N,2) integer array of
+(numerator, denominator) pairs in that order instead. Distinct fractions with denominators up to d
+differ by at least 1/d^2, so sorting by their float values is exact for any reasonable d.
+'''
+def rational_array(den_limit, actual_limit=1, exact=False):
+    pairs = rational_pairs(den_limit, actual_limit)
+    values = pairs[:,0] / pairs[:,1].astype(float)
+    order = np.argsort(values)
+    if exact:
+        return pairs[order]
+    return values[order]
+
+'''
+Lazily yields the same (numerator, denominator) pairs as rational_array(den_limit, actual_limit,
+exact=True), in increasing order, using the Farey recurrence: if a/b < c/d are neighbors in the
+Farey sequence of order n, the next term is (k*c-a)/(k*d-b) with k = (n+b)//d. Each interval [j,j+1]
+is the sequence over [0,1] shifted by j.
+'''
+def farey_pairs(den_limit, actual_limit=1):
+    yield (0,1)
+    for j in range(actual_limit):
+        (a,b,c,d) = (0,1,1,den_limit)
+        while c <= d:
+            yield (c + j*d, d)
+            k = (den_limit + b) // d
+            (a,b,c,d) = (c,d,k*c-a,k*d-b)
+
+'''
+Given an (N,3) array of points, returns the distinct permutations of each of them, in the order that
+itertools.permutations() lists them, as an (M,3) array with M <= 6N. For instance, the points
+
+[[1,2,3], [1,1,1]]
+
+turn into
+
+[[1,2,3], [1,3,2], [2,1,3], [2,3,1], [3,1,2], [3,2,1], [1,1,1]]
+
+This is fine because if <a,b,c> is a valid point, then there exists a probability vector. Now if the
+order of a,b,c gets changed, we just change the probability vector accordingly.
+'''
+def expand_permutations(points):
+    points = np.asarray(points).reshape(-1, 3)
+    orders = np.array(list(itertools.permutations(range(3))))
+    permuted = points[:,orders]
+    keep = np.ones(permuted.shape[:2], dtype=bool)
+    for k in range(1, len(orders)):
+        for j in range(k):
+            keep[:,k] &= np.any(permuted[:,k] != permuted[:,j], axis=1)
+    return permuted[keep]
+
+'''
+A set of frontier points, each stored once under its canonical key: its coordinates sorted in
+increasing order, which is the same for all its permutations. The canonical points are kept in a
+numpy array that doubles in size when full, with a dict from key to row, so adding a point and
+checking for one are O(1). Use expanded() to get all permutations back. Keys are exact, so points
+should be computed the same way each time (as they are in pareto.py).
+'''
+class PointSet(object):
+
+    def __init__(self, capacity=1024):
+        self.points = np.empty((capacity, 3))
+        self.size = 0
+        self.index = {}
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, point):
+        return tuple(sorted(point)) in self.index
 
+    '''
+    Adds one point. Returns True if it (or one of its permutations) was not in the set yet.
+    '''
+    def add(self, point):
+        return len(self.add_batch(np.asarray(point)[np.newaxis])) > 0
 
+    '''
+    Adds an (N,3) array of points. Returns the canonical points that were new, in the order they
+    were added, so a caller can write each class of points exactly once.
+    '''
+    def add_batch(self, points):
+        canonical = np.sort(np.asarray(points, dtype=float).reshape(-1, 3), axis=1)
+        added = []
+        for (row, key) in zip(canonical, map(tuple, canonical.tolist())):
+            if key in self.index:
+                continue
+            if self.size == len(self.points):
+                self.points = np.concatenate([self.points, np.empty_like(self.points)])
+            self.index[key] = self.size
+            self.points[self.size] = row
+            self.size += 1
+            added.append(self.size-1)
+        return self.points[added]
 
+    '''
+    The canonical points, as an (N,3) array, in the order they were added.
+    '''
+    def canonical(self):
+        return self.points[:self.size]
 
+    '''
+    All distinct permutations of all points, as an (M,3) array.
+    '''
+    def expanded(self):
+        return expand_permutations(self.canonical())